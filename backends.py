@@ -0,0 +1,271 @@
+import glob
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import config
+import connpool
+import growth
+import ingest
+import querycache
+import ranking
+import rollups
+
+try:
+    import duckdb
+    import storage
+except ImportError:
+    duckdb = None
+
+
+# Query backends for the Analysed Information tabs. Every backend answers
+# read_sql(sql, params) with a DataFrame and has a stamp() that changes with
+# its data, which is all querycache.read_sql needs:
+#
+#   sqlite  the read-only connpool.ConnectionPool over PhonePe.db
+#   duckdb  an in-process DuckDB over the Parquet store (see storage.py).
+#           The nine tables are views over the Parquet files. The Rollup_*,
+#           Rank_Index and Growth_* tables are built from them in memory
+#           with the same SQL as in SQLite, vectorized on every core, and
+#           rebuilt when a table of the store is republished.
+#
+# PHONEPE_QUERY_BACKEND picks one (default sqlite). The Raw Data pager pages
+# on SQLite rowids and always reads SQLite. Both backends must return the
+# same results for every dashboard query:
+#
+#     python backends.py          # exits 1 on any difference
+
+BACKENDS = ["sqlite", "duckdb"]
+
+# DuckDB names of the Arrow types in storage.arrow_schema
+DUCKDB_TYPES = {"string": "VARCHAR", "int64": "BIGINT", "double": "DOUBLE", "int16": "SMALLINT", "int8": "TINYINT"}
+
+_backends = {}
+_lock = threading.Lock()
+
+_LIMIT = re.compile(r"\s+LIMIT\s+\d+\s*;?\s*$", re.IGNORECASE)
+
+
+def _source_sql(table, path):
+    # The table as stored in one version directory, columns in the SQLite
+    # order. read_parquet fails on a directory without files (a table
+    # with no rows), so that one is an empty relation of the same types.
+    pattern = os.path.join(path, "**", "*.parquet").replace("\\", "/")
+    columns = ", ".join(ingest.DATASETS[table].columns)
+    if glob.glob(pattern, recursive=True):
+        # Year and Quater come from the paths.
+        return f"SELECT {columns} FROM read_parquet('{pattern}', hive_partitioning = true)"
+    nulls = ", ".join(f"CAST(NULL AS {DUCKDB_TYPES[str(field.type)]}) AS {field.name}"
+                      for field in storage.arrow_schema(table))
+    return f"SELECT {nulls} WHERE false"
+
+
+class DuckDBBackend:
+    name = "duckdb"
+
+    def __init__(self, root=config.PARQUET_DIR, threads=None):
+        if duckdb is None:
+            raise ImportError("The duckdb query backend needs the duckdb and pyarrow packages")
+        self.root = root
+        self.conn = duckdb.connect(":memory:", config={"threads": threads} if threads else {})
+        self.tables = []
+        self.loaded = None
+        self.lock = threading.Lock()
+        self.counters = {"builds": 0, "build_seconds": 0.0}
+        self.refresh()
+
+    def _build(self, versions):
+        # (Re)creates the table views and the derived tables in one
+        # transaction, so queries running meanwhile see the old set.
+        tables = [table for table, _, _ in versions]
+        statements = []
+        for table, path, _ in versions:
+            statements.append(f"CREATE OR REPLACE VIEW {table} AS {_source_sql(table, path)}")
+        for name, (source, _, _) in rollups.ROLLUPS.items():
+            if source in tables:
+                statements.append(f"CREATE OR REPLACE TABLE {name} AS {rollups.rollup_sql(name)}")
+        selects = [f"SELECT * FROM ({ranking.select_sql(source, level, metric)})"
+                   for source, level, metric in ranking.RANKINGS if source in tables]
+        if selects:
+            statements.append(f"CREATE OR REPLACE TABLE {ranking.TABLE} AS {' UNION ALL '.join(selects)}")
+        series = [name for name, (source, _, _) in growth.SERIES.items() if source in tables]
+        for name in series:
+            statements.append(f"CREATE OR REPLACE TABLE {growth.table_name(name)} AS {growth.growth_sql(name)}")
+            statements.append(f"CREATE OR REPLACE TABLE {growth.table_name(name)}_CAGR AS {growth.cagr_sql(name)}")
+        if series:
+            statements.append(f"CREATE OR REPLACE TABLE {growth.LEADERS} AS {growth.union_sql(series)}")
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("BEGIN TRANSACTION")
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.close()
+        self.tables = tables
+
+    def refresh(self):
+        # Rebuilds the views and derived tables if the store has changed
+        # since they were built.
+        stamp = self.stamp()
+        with self.lock:
+            if stamp != self.loaded:
+                start = time.perf_counter()
+                self._build(stamp[1:])
+                self.loaded = stamp
+                self.counters["builds"] += 1
+                self.counters["build_seconds"] += time.perf_counter() - start
+
+    def read_sql(self, sql, params=None):
+        # A cursor per query: cursors of one connection can run on several
+        # threads at once.
+        self.refresh()
+        cursor = self.conn.cursor()
+        try:
+            result = cursor.execute(sql, list(params or ()))
+            types = [str(kind) for _, kind, *_ in result.description]
+            frame = result.df()
+        finally:
+            cursor.close()
+        # SUM over BIGINT is a HUGEINT, which comes back as float64.
+        for column, kind in zip(frame.columns, types):
+            if kind == "HUGEINT" and frame[column].notna().all():
+                frame[column] = frame[column].astype("int64")
+        return frame
+
+    def stamp(self):
+        # The Parquet writer publishes every rebuild as a new version
+        # directory: (table, directory, mtime) of every table in the store.
+        stamp = [self.root]
+        for table in ingest.DATASETS:
+            path = storage.table_dir(table, self.root)
+            try:
+                stamp.append((table, path, os.stat(path).st_mtime_ns))
+            except FileNotFoundError:
+                continue
+        return tuple(stamp)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, tables=len(self.tables), root=self.root)
+
+
+def get_backend(name=None):
+    # The backend named by name or PHONEPE_QUERY_BACKEND, one per process.
+    name = name or config.QUERY_BACKEND
+    if name == "sqlite":
+        return connpool.get_pool(config.DB_PATH)
+    if name != "duckdb":
+        raise ValueError(f"Unknown query backend: {name}")
+    with _lock:
+        if name not in _backends:
+            _backends[name] = DuckDBBackend()
+        return _backends[name]
+
+
+def _sorted(frame):
+    frame = frame.reset_index(drop=True)
+    return frame.sort_values(list(frame.columns)).reset_index(drop=True) if len(frame.columns) else frame
+
+
+def _unordered_limit(sql):
+    normalized = querycache.normalize(sql).upper()
+    return " LIMIT " in normalized and " ORDER BY " not in normalized
+
+
+def _rows(frame):
+    # Rows as tuples of text, numbers to 12 significant digits.
+    columns = []
+    for column in frame.columns:
+        values = frame[column]
+        if pd.api.types.is_numeric_dtype(values):
+            columns.append([f"{value:.12g}" for value in values.to_numpy(float)])
+        else:
+            columns.append(values.astype(str).tolist())
+    return Counter(zip(*columns))
+
+
+def contained(part, whole):
+    # Every row of part is a row of whole (as often), ignoring dtypes.
+    return list(part.columns) == list(whole.columns) and not _rows(part) - _rows(whole)
+
+
+def equivalent(sql, expected, actual):
+    # Same columns and rows, ignoring row order and dtypes.
+    if list(expected.columns) != list(actual.columns) or len(expected) != len(actual):
+        return False
+    expected, actual = _sorted(expected), _sorted(actual)
+    for column in expected.columns:
+        left, right = expected[column], actual[column]
+        if pd.api.types.is_numeric_dtype(left) and pd.api.types.is_numeric_dtype(right):
+            if not np.allclose(left.to_numpy(float), right.to_numpy(float), rtol=1e-9, equal_nan=True):
+                return False
+        elif left.astype(str).tolist() != right.astype(str).tolist():
+            return False
+    return True
+
+
+def queries():
+    # Every dashboard query, ranking lookup and growth table, as (sql, params).
+    import benchmark
+
+    checks = [(sql, None) for sql in benchmark.dashboard_queries()]
+    for source, level, metric in ranking.RANKINGS:
+        for bottom in (False, True):
+            rank = "Rank_Asc" if bottom else "Rank"
+            checks.append((f"SELECT {rank} AS Rank, Name, Value FROM {ranking.TABLE} WHERE Dataset = ? "
+                           f"AND Metric = ? AND Level = ? AND Year = 0 AND Quater = 0 AND {rank} <= 10 "
+                           f"ORDER BY {rank}", (source, metric, level)))
+    for name in growth.SERIES:
+        checks.append((f"SELECT * FROM {growth.table_name(name)}", None))
+        checks.append((f"SELECT * FROM {growth.table_name(name)}_CAGR", None))
+    checks.append((f"SELECT * FROM {growth.LEADERS}", None))
+    return checks
+
+
+def compare(expected, actual, checks=None):
+    # The queries on which two backends disagree, as (sql, params, error).
+    failures = []
+    for sql, params in checks or queries():
+        try:
+            if _unordered_limit(sql):
+                # Each engine may pick any rows: as many, all from the
+                # result without the LIMIT.
+                left, right = expected.read_sql(sql, params), actual.read_sql(sql, params)
+                whole = expected.read_sql(_LIMIT.sub("", sql), params)
+                same = len(left) == len(right) and contained(left, whole) and contained(right, whole)
+            else:
+                same = equivalent(sql, expected.read_sql(sql, params), actual.read_sql(sql, params))
+            error = None if same else "different results"
+        except Exception as exception:
+            error = f"{type(exception).__name__}: {exception}"
+        if error:
+            failures.append((sql, params, error))
+    return failures
+
+
+def main(argv):
+    names = argv or BACKENDS
+    checks = queries()
+    reference = get_backend(names[0])
+    failed = 0
+    for name in names[1:]:
+        failures = compare(reference, get_backend(name), checks)
+        print(f"{name} vs {names[0]}: {len(checks) - len(failures)}/{len(checks)} queries agree")
+        for sql, params, error in failures:
+            print(f"  {error}: {sql[:100]} {params or ''}")
+        failed += len(failures)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,196 @@
+import os
+import ast
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+
+import backends
+import dataaccess
+import ingest
+import jsondecode
+import manifest
+import pipeline
+import synthetic
+
+
+# End-to-end benchmark on a synthetic pulse tree (see synthetic.py):
+#
+#     python benchmark.py --out bench.json                  # default scale
+#     python benchmark.py --states 36 --years 7 --districts 40 --baseline last-release.json
+#
+# Times JSON decoding per backend, every ingest stage, the streaming SQLite
+# load, the Parquet export, every SQL query in phonepestreamlit.py (on SQLite
+# and, when installed, DuckDB) and the Home page map aggregation, and writes
+# the results as JSON. With --baseline it compares against an earlier results
+# file and exits with 1 when a timing regressed by more than --tolerance.
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "phonepestreamlit.py")
+
+
+def timed(function, repeat=1):
+    # Runs function repeat times; returns (last result, timing dict).
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        runs.append(time.perf_counter() - start)
+    return result, {"seconds": statistics.median(runs), "min": min(runs), "runs": repeat}
+
+
+def dashboard_queries(path=APP):
+    # Every SQL string the dashboard runs: the query* assignments and the
+    # string literals passed straight to read_sql. Keyed on the normalized
+    # text, so results stay comparable when the file moves around.
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    queries = []
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant)
+                and isinstance(node.value.value, str)
+                and any(isinstance(t, ast.Name) and t.id.startswith("query") for t in node.targets)):
+            queries.append(node.value.value)
+        elif (isinstance(node, ast.Call) and getattr(node.func, "attr", None) == "read_sql"
+              and node.args and isinstance(node.args[0], ast.Constant)):
+            queries.append(node.args[0].value)
+    normalized = [" ".join(sql.split()).rstrip(";") for sql in queries]
+    return sorted(set(normalized))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(workdir, scale, workers=None, repeat=5):
+    source = os.path.join(workdir, "data")
+    db_path = os.path.join(workdir, "PhonePe.db")
+    csv_dir = os.path.join(workdir, "csv")
+    parquet_dir = os.path.join(workdir, "parquet")
+    manifest_path = os.path.join(workdir, "manifest.json")
+    os.makedirs(csv_dir, exist_ok=True)
+    # Every call below gets its paths explicitly; the defaults in config
+    # point at the real dashboard data.
+    results = {}
+    files, results["generate"] = timed(lambda: synthetic.generate(source, **scale))
+
+    tasks, results["ingest.plan"] = timed(lambda: ingest.plan_tasks(source))
+    for backend in jsondecode.available():
+        # Decoding alone, over every file of every dataset
+        start = time.perf_counter()
+        decoded = 0
+        for table, _, _, folder in tasks:
+            for _, path in ingest.quarter_files(folder):
+                jsondecode.load_fields(path, ingest.DATASETS[table].fields, backend)
+                decoded += 1
+        seconds = time.perf_counter() - start
+        results["decode." + backend] = {"seconds": seconds, "min": seconds, "runs": 1,
+                                        "files_per_sec": decoded / seconds}
+    tables = ingest.select_datasets()
+    parsed, results["ingest.parse"] = timed(lambda: ingest.run_tasks(ingest.parse_year, tasks, workers))
+    frames, results["ingest.merge"] = timed(lambda: ingest.merge_results(tables, parsed))
+    _, results["ingest.write_tables"] = timed(
+        lambda: ingest.write_tables(frames, None, os.path.join(workdir, "frames.db")))
+    del parsed, frames
+
+    counts, results["pipeline.sqlite"] = timed(
+        lambda: pipeline.run_pipeline(source, db_path, workers=workers, csv_dir=None, parquet_dir=None,
+                                      manifest_path=manifest_path))
+    _, results["pipeline.csv_parquet"] = timed(
+        lambda: pipeline.run_pipeline(source, os.path.join(workdir, "second.db"), workers=workers,
+                                      csv_dir=csv_dir, parquet_dir=parquet_dir))
+    _, results["incremental.noop"] = timed(
+        lambda: manifest.run_incremental(source, db_path, manifest_path, workers=workers,
+                                         csv_dir=None, parquet_dir=None))
+
+    conn = sqlite3.connect(db_path)
+    try:
+        for sql in dashboard_queries():
+            _, results["query: " + sql] = timed(lambda: conn.execute(sql).fetchall(), repeat)
+    finally:
+        conn.close()
+    if backends.duckdb is not None:
+        duck = backends.DuckDBBackend(parquet_dir)
+        for sql in dashboard_queries():
+            _, results["query.duckdb: " + sql] = timed(lambda: duck.read_sql(sql), repeat)
+
+    year = max(dataaccess.table_years("Aggregate_Transaction", csv_dir, parquet_dir))
+    for data_type in dataaccess.HOME_TABLES:
+        dataaccess.clear_cache()
+        _, results[f"home.state_totals.{data_type}.cold"] = timed(
+            lambda: dataaccess.state_totals(data_type, year, 1, csv_dir, parquet_dir))
+        _, results[f"home.state_totals.{data_type}.warm"] = timed(
+            lambda: dataaccess.state_totals(data_type, year, 1, csv_dir, parquet_dir), repeat)
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "workers": workers,
+        "scale": dict(scale, files=files),
+        "rows": counts,
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    # Returns [(name, baseline seconds, current seconds)] for timings that
+    # got slower than baseline * tolerance.
+    regressions = []
+    for name, timing in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before and timing["seconds"] > before["seconds"] * tolerance:
+            regressions.append((name, before["seconds"], timing["seconds"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ingest and dashboard queries on synthetic data.")
+    synthetic.add_arguments(parser)
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: all cores)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per query timing")
+    parser.add_argument("--workdir", help="keep the generated data here instead of a temporary directory")
+    parser.add_argument("--out", default="benchmark.json")
+    parser.add_argument("--baseline", help="earlier results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="allowed slowdown factor")
+    args = parser.parse_args(argv)
+
+    scale = {name: getattr(args, name) for name in
+             ("states", "years", "quarters", "districts", "pincodes", "brands", "seed")}
+    workdir = args.workdir or tempfile.mkdtemp(prefix="phonepe-bench-")
+    try:
+        report = run(workdir, scale, args.workers, args.repeat)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=1)
+    for name, timing in report["results"].items():
+        print(f"{timing['seconds'] * 1000:10.2f} ms  {name[:100]}")
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {after / before:.2f}x  {before * 1000:.2f} -> {after * 1000:.2f} ms  {name[:100]}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
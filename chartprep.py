@@ -0,0 +1,115 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+
+import config
+import instrument
+
+
+# Chart data trimmed before it is serialized for the browser. District and
+# pincode charts show the top PHONEPE_CHART_TOP_K categories and one "Others"
+# bar for the rest, drawn as a single trace colored by value rather than one
+# trace (and legend entry) per category. Line charts longer than
+# PHONEPE_CHART_MAX_POINTS keep the minimum and maximum of each bucket, so
+# peaks and dips survive. measure() records the serialized size of every
+# chart it is given; stats() totals them for the profiling panel.
+
+OTHERS = "Others"
+
+
+def top_k(frame, label, values, k=config.CHART_TOP_K, other=OTHERS):
+    # The k rows with the largest first value column, largest first, plus one
+    # row labelled other that sums the rest (left out when other is None).
+    values = [values] if isinstance(values, str) else list(values)
+    ranked = frame.sort_values(values[0], ascending=False)[[label] + values]
+    if len(ranked) <= k:
+        return ranked.reset_index(drop=True)
+    head, rest = ranked.iloc[:k], ranked.iloc[k:]
+    _stats.add("categories_dropped", len(rest) - (other is not None))
+    if other is None:
+        return head.reset_index(drop=True)
+    others = pd.DataFrame([{label: other, **rest[values].sum()}])
+    return pd.concat([head.astype({label: object}), others], ignore_index=True)
+
+
+def downsample(frame, x, values, max_points=config.CHART_MAX_POINTS):
+    # At most about max_points rows in x order: the first and last row and,
+    # per bucket, the rows holding the minimum and maximum of each column.
+    values = [values] if isinstance(values, str) else list(values)
+    if len(frame) <= max_points:
+        return frame
+    ordered = frame.sort_values(x).reset_index(drop=True)
+    buckets = max(max_points // (2 * len(values)), 1)
+    bucket = np.arange(len(ordered)) * buckets // len(ordered)
+    keep = {0, len(ordered) - 1}
+    for column in values:
+        grouped = ordered[column].groupby(bucket)
+        keep.update(grouped.idxmin().dropna())
+        keep.update(grouped.idxmax().dropna())
+    _stats.add("points_dropped", len(ordered) - len(keep))
+    return ordered.loc[sorted(keep)].reset_index(drop=True)
+
+
+def bar(frame, x, y, k=config.CHART_TOP_K, other=OTHERS, **kwargs):
+    # px.bar of the top k categories in one trace. The category axis is
+    # whichever of x and y is not the value column (y, as for px.bar,
+    # unless orientation="h").
+    label, value = (y, x) if kwargs.get("orientation") == "h" else (x, y)
+    data = top_k(frame, label, value, k, other)
+    figure = px.bar(data, x=x, y=y, color=value, **kwargs)
+    # Numeric labels such as pincodes are categories, not positions.
+    if label == x:
+        figure.update_xaxes(type="category")
+    else:
+        figure.update_yaxes(type="category")
+    return figure
+
+
+def payload_size(chart):
+    # Bytes sent to the browser: the figure JSON, or the frame as JSON for
+    # st.bar_chart / st.line_chart.
+    if chart is None:
+        return 0
+    if isinstance(chart, (pd.DataFrame, pd.Series)):
+        return len(chart.to_json(orient="split"))
+    return len(pio.to_json(chart, validate=False))
+
+
+class PayloadStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {"charts": 0, "bytes": 0, "largest": 0, "categories_dropped": 0, "points_dropped": 0}
+
+    def add(self, counter, amount):
+        with self.lock:
+            self.counters[counter] += amount
+
+    def record(self, size):
+        with self.lock:
+            self.counters["charts"] += 1
+            self.counters["bytes"] += size
+            self.counters["largest"] = max(self.counters["largest"], size)
+
+    def stats(self):
+        with self.lock:
+            charts = self.counters["charts"]
+            return dict(self.counters, mean_bytes=self.counters["bytes"] // charts if charts else 0)
+
+
+_stats = PayloadStats()
+
+
+def measure(name, chart):
+    # Records the serialized size of a figure or chart frame and returns it.
+    with instrument.span("payload", name) as info:
+        size = payload_size(chart)
+        info["bytes"] = size
+    _stats.record(size)
+    return size
+
+
+def stats():
+    return _stats.stats()
@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+import argparse
+import importlib.util
+
+import config
+import ingest
+import jsondecode
+import manifest
+import pipeline
+
+
+# Headless ingest, for cron jobs and CI:
+#
+#     python cli.py --source E:/PhonePe/pulse-master/data/ --db PhonePe.db --datasets aggregated --workers 8
+#     python cli.py --incremental --manifest PhonePe.manifest.json
+#
+# Besides PhonePe.db, both modes rewrite the CSV files (PHONEPE_DATA_DIR) and
+# the Parquet store (PHONEPE_PARQUET, when pyarrow is installed) that the
+# Home and Visualizations pages read; --no-csv and --no-parquet skip them.
+# Progress (folders done, rows and rows/s) goes to stderr, the summary to
+# stdout. The exit status is 0 on success and 1 when the ingest fails.
+
+
+class Progress:
+    # progress callback for run_pipeline. On a terminal the line is redrawn
+    # in place; otherwise a line is printed every `every` seconds. A quiet
+    # one only counts the rows.
+    def __init__(self, stream=sys.stderr, every=5.0, quiet=False):
+        self.stream = stream
+        self.every = every
+        self.quiet = quiet
+        self.interactive = stream.isatty()
+        self.start = time.perf_counter()
+        self.last = 0.0
+        self.rows = 0
+
+    def __call__(self, done, total, table, rows):
+        self.rows += rows
+        if self.quiet:
+            return
+        now = time.perf_counter() - self.start
+        if not self.interactive and done < total and now - self.last < self.every:
+            return
+        self.last = now
+        rate = self.rows / now if now else 0.0
+        eta = (total - done) * now / done
+        line = (f"[{done:>{len(str(total))}}/{total}] {done / total:6.1%}  {self.rows:>12,} rows  "
+                f"{rate:>10,.0f} rows/s  ETA {eta:5.0f}s  {table}")
+        if self.interactive:
+            self.stream.write("\r" + line.ljust(100) + ("\n" if done == total else ""))
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Build PhonePe.db from a pulse-master/data tree.")
+    parser.add_argument("--source", default=config.SOURCE_ROOT, help="pulse-master/data folder")
+    parser.add_argument("--db", default=config.DB_PATH, help="SQLite database to write")
+    parser.add_argument("--datasets", nargs="+", metavar="NAME",
+                        help="tables, kinds or subjects, e.g. Map_User aggregated top/insurance (default: all)")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help=f"rows per SQLite insert batch (default: {pipeline.DEFAULT_BATCH_SIZE}; full runs only)")
+    parser.add_argument("--csv-dir", default=config.DATA_DIR,
+                        help="folder of the CSV files to rewrite (default: PHONEPE_DATA_DIR)")
+    parser.add_argument("--no-csv", action="store_true", help="do not rewrite the CSV files")
+    parser.add_argument("--parquet-dir", default=config.PARQUET_DIR,
+                        help="Parquet store to rewrite (default: PHONEPE_PARQUET, skipped without pyarrow)")
+    parser.add_argument("--no-parquet", action="store_true", help="do not rewrite the Parquet store")
+    parser.add_argument("--manifest", help="manifest to refresh (full run) or compare against (--incremental)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only re-parse files that changed since the manifest was written")
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    return parser
+
+
+def outputs(args):
+    # (csv_dir, parquet_dir) to rewrite, None for the ones turned off. The
+    # default Parquet store is skipped when pyarrow is not installed.
+    csv_dir = None if args.no_csv else args.csv_dir
+    parquet_dir = None if args.no_parquet else args.parquet_dir
+    if parquet_dir == config.PARQUET_DIR and importlib.util.find_spec("pyarrow") is None:
+        parquet_dir = None
+    return csv_dir, parquet_dir
+
+
+def run(args):
+    tables = ingest.select_datasets(args.datasets)
+    if not os.path.isdir(args.source):
+        raise FileNotFoundError(f"Source folder not found: {args.source}")
+    csv_dir, parquet_dir = outputs(args)
+    start = time.perf_counter()
+
+    if args.incremental:
+        progress = Progress(quiet=args.quiet)
+        replaced = manifest.run_incremental(args.source, args.db, args.manifest or config.MANIFEST_PATH,
+                                            tables, args.workers, csv_dir, parquet_dir, progress)
+        seconds = time.perf_counter() - start
+        for table in tables:
+            print(f"{table:22} {replaced.get(table, 0):>8,} periods replaced")
+        if progress.rows:
+            print(f"{progress.rows:,} rows re-parsed in {seconds:.1f}s ({progress.rows / seconds:,.0f} rows/s)")
+        print(f"Up to date in {seconds:.1f}s")
+        return
+
+    files = sum(len(ingest.quarter_files(folder)) for *_, folder in ingest.plan_tasks(args.source, tables))
+    if not files:
+        raise FileNotFoundError(f"No quarter files for {', '.join(tables)} under {args.source}")
+    counts = pipeline.run_pipeline(args.source, args.db, tables, args.workers,
+                                   args.batch_size or pipeline.DEFAULT_BATCH_SIZE, csv_dir, parquet_dir, args.manifest,
+                                   progress=None if args.quiet else Progress())
+    seconds = time.perf_counter() - start
+    for table, rows in counts.items():
+        print(f"{table:22} {rows:>12,} rows")
+    total = sum(counts.values())
+    print(f"{total:,} rows from {files:,} files in {seconds:.1f}s "
+          f"({total / seconds:,.0f} rows/s, {files / seconds:,.0f} files/s)")
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.incremental and args.batch_size is not None:
+        parser.error("--batch-size only applies to full runs, not --incremental")
+    try:
+        jsondecode.backend_name()
+    except (ValueError, ImportError) as error:
+        print(f"Invalid PHONEPE_JSON={config.JSON_BACKEND!r}: {error}", file=sys.stderr)
+        return 1
+    try:
+        run(args)
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        return 130
+    except Exception as error:
+        print(f"Ingest failed: {error}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+import os
+
+# Where the pulse-master checkout, the exported CSV files and the SQLite
+# database live. The defaults are the paths the notebook was written
+# against; set the environment variables to run the project somewhere else.
+SOURCE_ROOT = os.environ.get("PHONEPE_SOURCE", "E:/PhonePe/pulse-master/data/")
+DATA_DIR = os.environ.get("PHONEPE_DATA_DIR", "E:/PhonePe/")
+DB_PATH = os.environ.get("PHONEPE_DB", "PhonePe.db")
+# Read-only connections the dashboard keeps open per process (see connpool.py).
+DB_POOL_SIZE = int(os.environ.get("PHONEPE_DB_POOL", "4"))
+# Engine behind the Analysed Information queries: "sqlite" (PhonePe.db) or
+# "duckdb" (the Parquet store), see backends.py.
+QUERY_BACKEND = os.environ.get("PHONEPE_QUERY_BACKEND", "sqlite")
+# Memory bound of the dashboard's query-result cache (see querycache.py).
+QUERY_CACHE_MB = int(os.environ.get("PHONEPE_QUERY_CACHE_MB", "64"))
+# Memory bound of the filtered district and pincode loads kept by
+# dataaccess.py.
+PRUNED_CACHE_MB = int(os.environ.get("PHONEPE_PRUNED_CACHE_MB", "64"))
+# Memory bound of the Home page map figures kept per selection (see figcache.py).
+FIGURE_CACHE_MB = int(os.environ.get("PHONEPE_FIGURE_CACHE_MB", "32"))
+# Categories a district or pincode chart shows before the rest are summed into
+# "Others", and the points a line chart keeps at most (see chartprep.py).
+CHART_TOP_K = int(os.environ.get("PHONEPE_CHART_TOP_K", "20"))
+CHART_MAX_POINTS = int(os.environ.get("PHONEPE_CHART_MAX_POINTS", "500"))
+# Background threads that warm figures for the neighbouring quarters, and how
+# much of the figure cache they may fill (see prefetch.py).
+PREFETCH_WORKERS = int(os.environ.get("PHONEPE_PREFETCH_WORKERS", "2"))
+PREFETCH_MB = int(os.environ.get("PHONEPE_PREFETCH_MB", "16"))
+# JSON decoder for ingest: "auto" (simdjson, then orjson), "orjson", "simdjson"
+# or "json" (see jsondecode.py).
+JSON_BACKEND = os.environ.get("PHONEPE_JSON", "auto")
+MANIFEST_PATH = os.environ.get("PHONEPE_MANIFEST", "PhonePe.manifest.json")
+PARQUET_DIR = os.environ.get("PHONEPE_PARQUET", os.path.join(DATA_DIR, "parquet"))
+# Local copies of the India state GeoJSON and how detailed the map should be
+# ("full", "high", "medium" or "low", see geo.py).
+GEO_DIR = os.environ.get("PHONEPE_GEO_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets"))
+GEO_DETAIL = os.environ.get("PHONEPE_GEO_DETAIL", "medium")
+# Profiling (see instrument.py): a JSON-lines file for every timed span, and
+# whether the dashboard shows its debug panel (also ?profile=1 in the URL).
+PROFILE_LOG = os.environ.get("PHONEPE_PROFILE_LOG") or None
+PROFILE_PANEL = os.environ.get("PHONEPE_PROFILE", "0") == "1"
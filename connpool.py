@@ -0,0 +1,136 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+import config
+import querycache
+
+
+# Read-only SQLite connections shared by every Streamlit session of the
+# process. Streamlit runs each session's script on its own thread, so one
+# module-level connection either trips the same-thread check or makes every
+# session wait on the others. A pool hands out one connection per query:
+#
+#     with connpool.get_pool().connection() as conn:
+#         frame = pd.read_sql_query(sql, conn)
+#
+# Connections are opened lazily up to the pool size. When all of them are
+# busy the caller waits; stats() reports how often and for how long.
+
+_pools = {}
+_lock = threading.Lock()
+
+
+class ConnectionPool:
+    # The "sqlite" query backend (see backends.py).
+    name = "sqlite"
+
+    def __init__(self, db_path=config.DB_PATH, size=config.DB_POOL_SIZE, timeout=30, cache_kib=32768):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.cache_kib = cache_kib
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.in_use = 0
+        self.counters = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+                           "peak_in_use": 0, "timeouts": 0}
+
+    def _connect(self):
+        # mode=ro: the dashboard never writes. The database is in WAL mode
+        # (set by the ingest), so readers do not block the writer.
+        uri = "file:{}?mode=ro".format(os.path.abspath(self.db_path).replace("\\", "/"))
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=self.timeout)
+        for pragma in (f"cache_size = -{self.cache_kib}", "mmap_size = 268435456",
+                       "temp_store = MEMORY", "query_only = ON"):
+            conn.execute("PRAGMA " + pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.opened < self.size:
+                self.opened += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self.lock:
+                    self.opened -= 1
+                raise
+        # Every connection is busy: the pool is saturated.
+        start = time.perf_counter()
+        try:
+            conn = self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self.lock:
+                self.counters["timeouts"] += 1
+            raise TimeoutError(f"No free connection to {self.db_path} after {self.timeout}s")
+        waited = time.perf_counter() - start
+        with self.lock:
+            self.counters["waited"] += 1
+            self.counters["wait_seconds"] += waited
+            self.counters["max_wait_seconds"] = max(self.counters["max_wait_seconds"], waited)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        with self.lock:
+            self.in_use += 1
+            self.counters["acquired"] += 1
+            self.counters["peak_in_use"] = max(self.counters["peak_in_use"], self.in_use)
+        try:
+            yield conn
+        finally:
+            # A read left open would pin an old WAL snapshot.
+            if conn.in_transaction:
+                conn.rollback()
+            with self.lock:
+                self.in_use -= 1
+            self.idle.put(conn)
+
+    def read_sql(self, sql, params=None):
+        with self.connection() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def stamp(self):
+        # Changes whenever the database file does (see querycache.py).
+        return self.db_path, querycache.db_stamp(self.db_path)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters, size=self.size, opened=self.opened, in_use=self.in_use)
+        stats["saturation"] = stats["waited"] / stats["acquired"] if stats["acquired"] else 0.0
+        return stats
+
+    def close(self):
+        # Closes the idle connections, e.g. before the database file is replaced.
+        while True:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self.lock:
+                self.opened -= 1
+
+
+def get_pool(db_path=config.DB_PATH):
+    # One pool per database file and process.
+    with _lock:
+        if db_path not in _pools:
+            _pools[db_path] = ConnectionPool(db_path)
+        return _pools[db_path]
@@ -0,0 +1,232 @@
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import config
+import ingest
+import instrument
+import states
+
+try:
+    import storage
+except ImportError:  # pyarrow is not installed, read the CSV files instead
+    storage = None
+
+
+# One read-only copy of each table per process, shared by every Streamlit
+# session and rerun. Each entry carries the stamp of the file it was read
+# from; when the Parquet store or CSV file
+# is rebuilt its stamp changes and the next read loads it again.
+#
+# Frames handed out are shared: callers may filter them or assign new
+# columns on their own copy, but must not modify them in place.
+#
+# Every function reads from data_dir (the CSV files) and parquet_dir (the
+# Parquet store), which default to PHONEPE_DATA_DIR and PHONEPE_PARQUET.
+#
+# The district and pincode tables (PRUNED_TABLES) are the large ones and the
+# dashboard only ever needs one State/Year/Quarter of them, so filtered
+# loads of those read just the requested columns and (Year, Quater)
+# partitions from the Parquet store instead of keeping the whole table. Each
+# such load is kept per (table, columns, filters) with the table's stamp,
+# least recently used first, up to PHONEPE_PRUNED_CACHE_MB.
+
+_entries = {}
+_loading = {}
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "reloads": 0, "pruned_hits": 0, "pruned_misses": 0, "pruned_evictions": 0}
+
+# (table, dirs, columns, filters) -> (stamp, frame, size in bytes)
+_pruned = OrderedDict()
+_pruned_bytes = 0
+
+PRUNED_TABLES = {"Map_Transaction", "Map_User", "Map_Insurance", "Top_Transaction", "Top_User", "Top_Insurance"}
+
+# The Home page shows one of these per selection: (table, measure columns).
+HOME_TABLES = {
+    "Transaction": ("Aggregate_Transaction", ["Transaction_Amount", "Transaction_Count"]),
+    "User": ("Aggregate_User", ["User_Count"]),
+    "Insurance": ("Aggregate_Insurance", ["Insurance_Amount", "Insurance_Count"]),
+}
+
+
+def _dirs(data_dir=None, parquet_dir=None):
+    return data_dir or config.DATA_DIR, parquet_dir or config.PARQUET_DIR
+
+
+def _csv_path(table, dirs):
+    return os.path.join(dirs[0], table + ".csv")
+
+
+def _uses_parquet(table, dirs):
+    return storage is not None and storage.has_table(table, dirs[1])
+
+
+def source_stamp(table, data_dir=None, parquet_dir=None):
+    # The Parquet writer publishes a new version directory and the CSV sink
+    # rewrites the file, so one stat is enough to notice a rebuild.
+    dirs = _dirs(data_dir, parquet_dir)
+    path = storage.table_dir(table, dirs[1]) if _uses_parquet(table, dirs) else _csv_path(table, dirs)
+    info = os.stat(path)
+    return path, info.st_mtime_ns, info.st_size
+
+
+def compact(frame):
+    # Smallest dtypes that hold the data: categoricals for the text columns
+    # (a few dozen states or brands repeated over every row), int16/int8 for
+    # Year/Quater and downcast measures. Floats only become float32 when no
+    # value changes, so the totals are not affected.
+    columns = {}
+    for column in frame.columns:
+        kind = ingest.COLUMN_TYPES.get(column)
+        values = frame[column]
+        if kind == "TEXT":
+            columns[column] = values.astype("category")
+        elif column == "Year":
+            columns[column] = values.astype("int16")
+        elif column == "Quater":
+            columns[column] = values.astype("int8")
+        elif kind == "INTEGER":
+            columns[column] = pd.to_numeric(values, downcast="integer")
+        elif kind == "REAL":
+            columns[column] = pd.to_numeric(values, downcast="float")
+        else:
+            columns[column] = values
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def _read(table, dirs, columns=None, filters=None):
+    # The whole table, or with columns/filters only what the Parquet store
+    # holds in those columns and partitions.
+    with instrument.span("load", table, pruned=filters is not None) as info:
+        if _uses_parquet(table, dirs):
+            frame = compact(storage.read_table(table, columns, filters, dirs[1]))
+        else:
+            frame = compact(pd.read_csv(_csv_path(table, dirs), dtype={"Pincode": str}))
+        # Older files may still hold earlier spellings of some states
+        if "State" in frame.columns:
+            frame["State"] = states.canonicalize(frame["State"])
+        info["rows"] = len(frame)
+    return frame
+
+
+def _read_pruned(table, dirs, columns, filters):
+    # State is matched after canonicalizing, since the store may hold older
+    # spellings; the other filters are pushed down to storage.read_table.
+    pushed = {column: value for column, value in filters.items() if column != "State"}
+    needed = None if columns is None else list(dict.fromkeys(list(columns) + list(filters)))
+    frame = _read(table, dirs, needed, pushed)
+    if "State" in filters:
+        frame = frame[frame["State"] == filters["State"]].reset_index(drop=True)
+    return frame if columns is None else frame[columns]
+
+
+def _pruned_key(table, dirs, columns, filters):
+    frozen = tuple(sorted((column, tuple(value) if isinstance(value, (list, tuple, set)) else value)
+                          for column, value in filters.items()))
+    return table, dirs, None if columns is None else tuple(columns), frozen
+
+
+def get_pruned(table, columns, filters, data_dir=None, parquet_dir=None):
+    # The shared copy of a filtered load of one of PRUNED_TABLES.
+    global _pruned_bytes
+    dirs = _dirs(data_dir, parquet_dir)
+    key = _pruned_key(table, dirs, columns, filters)
+    stamp = source_stamp(table, *dirs)
+    with _lock:
+        entry = _pruned.get(key)
+        if entry is not None and entry[0] == stamp:
+            _pruned.move_to_end(key)
+            _stats["pruned_hits"] += 1
+            return entry[1]
+        _stats["pruned_misses"] += 1
+    frame = _read_pruned(table, dirs, columns, filters)
+    size = int(frame.memory_usage(deep=True).sum())
+    with _lock:
+        if key in _pruned:
+            _pruned_bytes -= _pruned.pop(key)[2]
+        if size <= config.PRUNED_CACHE_MB * 1024 * 1024:
+            _pruned[key] = (stamp, frame, size)
+            _pruned_bytes += size
+            while _pruned_bytes > config.PRUNED_CACHE_MB * 1024 * 1024:
+                _, (_, _, dropped) = _pruned.popitem(last=False)
+                _pruned_bytes -= dropped
+                _stats["pruned_evictions"] += 1
+    return frame
+
+
+def get_table(table, data_dir=None, parquet_dir=None):
+    # The shared copy of a table.
+    dirs = _dirs(data_dir, parquet_dir)
+    key = (table, dirs)
+    stamp = source_stamp(table, *dirs)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            _stats["hits"] += 1
+            return entry[1]
+        # Concurrent sessions asking for the same table wait for one load.
+        table_lock = _loading.setdefault(key, threading.Lock())
+    with table_lock:
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                _stats["hits"] += 1
+                return entry[1]
+            _stats["misses"] += 1
+            if entry is not None:
+                _stats["reloads"] += 1
+        frame = _read(table, dirs)
+        with _lock:
+            _entries[key] = (stamp, frame)
+        return frame
+
+
+def load_table(table, columns=None, filters=None, data_dir=None, parquet_dir=None):
+    # Columns of a table restricted to the rows matching filters, e.g.
+    # {"Year": 2021, "Quater": 3}. Filtering happens on the shared copy,
+    # except for PRUNED_TABLES in the Parquet store.
+    dirs = _dirs(data_dir, parquet_dir)
+    if filters and table in PRUNED_TABLES and _uses_parquet(table, dirs):
+        return get_pruned(table, columns, filters, *dirs).copy(deep=False)
+    frame = get_table(table, *dirs)
+    if filters:
+        mask = pd.Series(True, index=frame.index)
+        for column, value in filters.items():
+            mask &= frame[column] == value
+        frame = frame[mask]
+    else:
+        frame = frame.copy(deep=False)
+    return frame if columns is None else frame[columns]
+
+
+def table_years(table, data_dir=None, parquet_dir=None):
+    dirs = _dirs(data_dir, parquet_dir)
+    if _uses_parquet(table, dirs):
+        return {year for year, _ in storage.partitions(table, dirs[1])}
+    return set(get_table(table, *dirs)["Year"])
+
+
+def state_totals(data_type, year, quarter, data_dir=None, parquet_dir=None):
+    # Home page map data: measures summed by State for one Year/Quater.
+    table, measures = HOME_TABLES[data_type]
+    filtered = load_table(table, ["State"] + measures, {"Year": year, "Quater": quarter}, data_dir, parquet_dir)
+    # State names were canonicalized when the table was loaded
+    return filtered.groupby("State", observed=True)[measures].sum().reset_index(), measures[0]
+
+
+def cache_stats():
+    with _lock:
+        size = sum(int(frame.memory_usage(deep=True).sum()) for _, frame in _entries.values())
+        return dict(_stats, entries=len(_entries), bytes=size, pruned_entries=len(_pruned),
+                    pruned_bytes=_pruned_bytes)
+
+
+def clear_cache():
+    global _pruned_bytes
+    with _lock:
+        _entries.clear()
+        _pruned.clear()
+        _pruned_bytes = 0
@@ -0,0 +1,252 @@
+import threading
+from collections import OrderedDict
+
+import plotly.express as px
+
+import chartprep
+import config
+import dataaccess
+import geo
+import instrument
+
+
+# Home page choropleths and Visualizations charts, built once per selection
+# ((Data Type, Year, Quarter) and map detail level, or (State, Year,
+# Quarter)) and shared by every session. There are only a few dozen Home
+# combinations, so switching quarters becomes a lookup instead of a groupby
+# plus px.choropleth. Entries are keyed on the stamps of the tables they were
+# built from as well, so a rebuilt table gets new figures. prefetch.py fills
+# in the neighbours of the current selection in the background.
+#
+# Every map carries its own copy of the GeoJSON, so the cache is bounded
+# by the size of the serialized figures and the least recently used ones
+# are dropped first. Figures handed out are shared: render them, do not
+# update them.
+
+
+def build_map(agg, value_col, data_type, year, quarter, level=config.GEO_DETAIL):
+    fig_map = px.choropleth(
+        agg,
+        geojson=geo.india_states(level),
+        featureidkey="properties.ST_NM",
+        locations="State",
+        color=value_col,
+        hover_name="State",
+        hover_data={col: True for col in agg.columns if col != "State"},
+        color_continuous_scale="YlGnBu",
+        title=f"{data_type} Data — Q{quarter} {year}"
+    )
+    fig_map.update_geos(
+        visible=False,
+        projection=dict(type='mercator'),
+        lonaxis=dict(range=[68, 98]),
+        lataxis=dict(range=[6, 38])
+    )
+    fig_map.update_layout(
+        title=dict(text="PhonePe Transaction Amount by State", x=0.5),
+        margin={'r': 0, 't': 30, 'l': 0, 'b': 0},
+        height=700,
+        width=1000
+    )
+    fig_map.update_traces(
+        hovertemplate="<b>%{location}</b><br><span style='color:#28a745'><b>Value:</b></span> %{z:,}<extra></extra>"
+    )
+    return fig_map
+
+
+def build_state_charts(state, year, quarter):
+    # The Visualizations charts for one state and Year/Quarter, in page order.
+    selection = {"State": state, "Year": year, "Quater": quarter}
+    filtered_txn = dataaccess.load_table("Aggregate_Transaction", filters=selection)
+    df_ins_filtered = dataaccess.load_table("Aggregate_Insurance", filters=selection)
+    df_district_filtered = dataaccess.load_table("Map_Transaction", filters=selection)
+    df_pincode_filtered = dataaccess.load_table("Top_Transaction", filters=selection)
+    df_yearly = dataaccess.load_table("Aggregate_Transaction", ["Year", "Quater", "Transaction_Count"],
+                                      {"State": state})
+    return [
+        # Top districts plus "Others" in one trace (see chartprep.py)
+        chartprep.bar(
+            df_district_filtered,
+            x="District",
+            y="Transaction_Count",
+            title=f"District-wise Transactions in {state} - Q{quarter}, {year}"
+        ),
+        px.bar(
+            df_ins_filtered,
+            x="Transaction_Name",
+            y="Insurance_Count",
+            color="Insurance_Count",
+            title=f"Insurance Transactions in {state} - Q{quarter}, {year}"
+        ),
+        px.bar(
+            filtered_txn,
+            x="Transaction_Name",
+            y="Transaction_Count",
+            color="Transaction_Name",
+            title=f" Transactions in {state} - Q{quarter}, {year}"
+        ),
+        px.pie(
+            filtered_txn,
+            names="Transaction_Name",
+            values="Transaction_Amount",
+            title=f"Transaction Amount Distribution in {state} - Q{quarter}, {year}"
+        ),
+        chartprep.bar(
+            df_pincode_filtered,
+            x="Transaction_Count",
+            y="Pincode",
+            k=15,
+            other=None,
+            orientation="h",
+            title=f"Top 15 Pincode Transactions in {state} - Q{quarter}, {year}",
+            log_x=True  # Optional: makes small values more visible
+        ),
+        px.bar(
+            df_yearly,
+            x="Year",
+            y="Transaction_Count",
+            color="Quater",
+            barmode="group",
+            title=f"Yearly Transaction Trends in {state}"
+        ),
+    ]
+
+
+class FigureCache:
+    def __init__(self, max_bytes=config.FIGURE_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        # key -> (value, size, prefetched)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        # Size of the prefetched entries no user has asked for yet
+        self.prefetched_bytes = 0
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "prefetched": 0}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            value, size, prefetched = entry
+            if prefetched:
+                # A user is looking at it now, so it no longer counts
+                # against the prefetch budget.
+                self.entries[key] = (value, size, False)
+                self.prefetched_bytes -= size
+            return value
+
+    def contains(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def put(self, key, value, size, budget=None):
+        # With a budget (bytes) the entry is a prefetch: it is only added if
+        # the prefetched entries nobody has used yet stay within the budget
+        # and the cache has room for it, so prefetching never evicts what
+        # users are looking at.
+        limit = self.max_bytes if budget is None else min(budget, self.max_bytes)
+        if size > limit:
+            return False
+        prefetched = budget is not None
+        with self.lock:
+            if prefetched and (key in self.entries or self.prefetched_bytes + size > limit
+                               or self.bytes + size > self.max_bytes):
+                return False
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (value, size, prefetched)
+            self.bytes += size
+            if prefetched:
+                self.prefetched_bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.counters["evictions"] += 1
+            return True
+
+    def _drop(self, key):
+        # Called with the lock held.
+        _, size, prefetched = self.entries.pop(key)
+        self.bytes -= size
+        if prefetched:
+            self.prefetched_bytes -= size
+
+    def _cached(self, name, key, build, budget=None, **fields):
+        # build() -> (value, size in bytes). A prefetch (budget given) only
+        # fills a missing entry and is not counted as a hit or miss.
+        with instrument.span("figure", name, prefetch=budget is not None, **fields) as info:
+            if budget is not None:
+                if self.contains(key):
+                    info["cached"] = True
+                    return None
+                value, size = build()
+                if self.put(key, value, size, budget):
+                    with self.lock:
+                        self.counters["prefetched"] += 1
+                return value
+            value = self.get(key)
+            info["cached"] = value is not None
+            if value is None:
+                value, size = build()
+                self.put(key, value, size)
+            return value
+
+    def home(self, data_type, year, quarter, level=config.GEO_DETAIL, budget=None):
+        # (state totals, measure column, choropleth) for the Home page; the
+        # figure is None when there is no data for the selection. The totals
+        # frame is shared and must not be modified.
+        table, _ = dataaccess.HOME_TABLES[data_type]
+        key = ("home", data_type, int(year), int(quarter), level, dataaccess.source_stamp(table))
+
+        def build():
+            agg, value_col = dataaccess.state_totals(data_type, year, quarter)
+            figure = None if agg.empty else build_map(agg, value_col, data_type, year, quarter, level)
+            size = chartprep.measure("home_map", figure)
+            return (agg, value_col, figure), size + int(agg.memory_usage(deep=True).sum())
+        return self._cached("home_map", key, build, budget, data_type=data_type, year=year, quarter=quarter)
+
+    def state_charts(self, state, year, quarter, budget=None):
+        # The Visualizations page figures for one state and Year/Quarter.
+        stamps = tuple(dataaccess.source_stamp(table) for table in
+                       ("Aggregate_Transaction", "Aggregate_Insurance", "Map_Transaction", "Top_Transaction"))
+        key = ("state", str(state), int(year), int(quarter), stamps)
+
+        def build():
+            figures = build_state_charts(state, year, quarter)
+            return figures, sum(chartprep.measure("state_charts", figure) for figure in figures)
+        return self._cached("state_charts", key, build, budget, state=state, year=year, quarter=quarter)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, entries=len(self.entries), bytes=self.bytes, max_bytes=self.max_bytes,
+                        prefetched_bytes=self.prefetched_bytes,
+                        hit_rate=self.counters["hits"] / lookups if lookups else 0.0)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.prefetched_bytes = 0
+
+
+_cache = FigureCache()
+
+
+def home(data_type, year, quarter, level=config.GEO_DETAIL, budget=None):
+    return _cache.home(data_type, year, quarter, level, budget)
+
+
+def state_charts(state, year, quarter, budget=None):
+    return _cache.state_charts(state, year, quarter, budget)
+
+
+def stats():
+    return _cache.stats()
+
+
+def clear():
+    _cache.clear()
@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import threading
+
+import numpy as np
+
+import config
+import instrument
+
+
+# India state boundaries for the Home page map. The GeoJSON is fetched from
+# the gist once and kept under config.GEO_DIR; hosts without internet just
+# need that file copied in. Besides the full file there are simplified,
+# coordinate-quantized versions at a few detail levels, so the choropleth
+# ships a much smaller payload to the browser. Each level is parsed once per
+# process.
+#
+#     python geo.py          # fetch (if needed) and build every level
+
+GEOJSON_URL = ("https://gist.githubusercontent.com/jbrobst/56c13bbbf9d97d187fea01ca62ea5112/raw/"
+               "e388c4cae20aa53cb5090210a42ebb9b765c0a36/india_states.geojson")
+
+# level: (Douglas-Peucker tolerance in degrees, decimals kept)
+LEVELS = {
+    "high": (0.002, 4),
+    "medium": (0.01, 3),
+    "low": (0.03, 2),
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def asset_path(level="full"):
+    name = "india_states.geojson" if level == "full" else f"india_states.{level}.geojson"
+    return os.path.join(config.GEO_DIR, name)
+
+
+def fetch():
+    # Downloads the full GeoJSON into the asset directory.
+    import requests
+    response = requests.get(GEOJSON_URL, timeout=30)
+    response.raise_for_status()
+    os.makedirs(config.GEO_DIR, exist_ok=True)
+    with open(asset_path(), "wb") as f:
+        f.write(response.content)
+
+
+def _simplify_line(points, tolerance):
+    # Douglas-Peucker on an (n, 2) array; returns the kept points.
+    if len(points) < 3:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+
+def _simplify_ring(ring, tolerance, decimals):
+    points = _simplify_line(np.asarray(ring, dtype=float), tolerance).round(decimals)
+    # Quantizing can make neighbouring points equal; drop the repeats.
+    points = points[np.r_[True, np.any(np.diff(points, axis=0) != 0, axis=1)]]
+    if len(points) < 4:
+        return None
+    return points.tolist()
+
+
+def _simplify_polygon(polygon, tolerance, decimals):
+    rings = [_simplify_ring(ring, tolerance, decimals) for ring in polygon]
+    if rings[0] is None:
+        return None
+    # Holes that collapse are dropped, the outer ring is kept.
+    return [ring for ring in rings if ring is not None]
+
+
+def simplify(geojson, tolerance, decimals):
+    # Returns a smaller copy: simplified rings, rounded coordinates and only
+    # the ST_NM property the map joins on.
+    features = []
+    for feature in geojson["features"]:
+        geometry = feature["geometry"]
+        if geometry["type"] == "Polygon":
+            polygons = [geometry["coordinates"]]
+        else:
+            polygons = geometry["coordinates"]
+        kept = [p for p in (_simplify_polygon(p, tolerance, decimals) for p in polygons) if p]
+        if not kept:
+            # Tiny islands vanish at coarse levels; keep their largest polygon.
+            largest = max(polygons, key=lambda p: len(p[0]))
+            kept = [[np.round(np.asarray(ring, dtype=float), decimals).tolist() for ring in largest]]
+        features.append({
+            "type": "Feature",
+            "properties": {"ST_NM": feature["properties"]["ST_NM"]},
+            "geometry": {"type": "MultiPolygon", "coordinates": kept},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def precompute(levels=None):
+    # Builds the simplified files from the full one (fetching it if needed).
+    if not os.path.exists(asset_path()):
+        fetch()
+    full = _read(asset_path())
+    sizes = {"full": os.path.getsize(asset_path())}
+    for level in levels or LEVELS:
+        tolerance, decimals = LEVELS[level]
+        with open(asset_path(level), "w", encoding="utf-8") as f:
+            json.dump(simplify(full, tolerance, decimals), f, separators=(",", ":"))
+        sizes[level] = os.path.getsize(asset_path(level))
+    return sizes
+
+
+def india_states(level=config.GEO_DETAIL):
+    # The parsed GeoJSON for a detail level ("full", "high", "medium", "low").
+    # Callers share the returned object and must not modify it.
+    with _lock, instrument.span("geo", level) as info:
+        info["cached"] = level in _loaded
+        if level not in _loaded:
+            if not os.path.exists(asset_path(level)):
+                if level == "full":
+                    fetch()
+                else:
+                    precompute([level])
+            _loaded[level] = _read(asset_path(level))
+        info["rows"] = len(_loaded[level]["features"])
+        return _loaded[level]
+
+
+if __name__ == "__main__":
+    for name, size in precompute(sys.argv[1:] or None).items():
+        print(f"{name:>6}: {size / 1024:,.0f} KiB  {asset_path(name)}")
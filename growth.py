@@ -0,0 +1,195 @@
+import math
+import sqlite3
+
+import config
+import querycache
+import schema
+
+
+# Quarter-on-quarter and year-on-year growth, 4-quarter rolling averages and
+# CAGR for every series the dashboard charts over time, computed in one pass
+# per series with window functions and stored next to the rollups:
+#
+#   Growth_<series>       one row per key and (Year, Quater): Value, QoQ, YoY
+#                         and Rolling_4Q
+#   Growth_<series>_CAGR  one row per key: compound annual growth between the
+#                         first and last complete years
+#   Growth_Leaders        every key of every series at the latest quarter,
+#                         ranked by YoY and by CAGR ("fastest growing")
+#
+# QoQ and YoY are only set when the previous quarter or the same quarter a
+# year earlier exists and is non-zero, so gaps never produce a growth figure.
+# The same SQL also runs as DuckDB views (see backends.py).
+#
+# series: (source table, key columns, measure)
+SERIES = {
+    "State": ("Aggregate_Transaction", ["State"], "Transaction_Amount"),
+    "State_Type": ("Aggregate_Transaction", ["State", "Transaction_Name"], "Transaction_Amount"),
+    "State_District": ("Map_Transaction", ["State", "District"], "Transaction_Amount"),
+    "Brand": ("Aggregate_User", ["User_Brand"], "User_Count"),
+}
+
+# Names shown in the dashboard
+LABELS = {
+    "State": "States by transaction amount",
+    "State_Type": "Transaction types by state",
+    "State_District": "Districts by transaction amount",
+    "Brand": "Device brands by users",
+}
+
+LEADERS = "Growth_Leaders"
+
+def table_name(series):
+    return "Growth_" + series
+
+
+def growth_sql(series):
+    source, keys, measure = SERIES[series]
+    columns = ", ".join(keys)
+    not_null = " AND ".join(f"{key} IS NOT NULL" for key in keys)
+    return f"""
+        WITH base AS (
+            SELECT {columns}, Year, Quater, Year * 4 + Quater - 1 AS Period, SUM({measure}) AS Value
+            FROM {source} WHERE {not_null} GROUP BY {columns}, Year, Quater
+        ), lagged AS (
+            SELECT *,
+                   LAG(Value) OVER by_period AS Previous_Value,
+                   LAG(Period) OVER by_period AS Previous_Period,
+                   LAG(Value) OVER by_quarter AS Year_Ago_Value,
+                   LAG(Year) OVER by_quarter AS Year_Ago,
+                   AVG(Value) OVER (PARTITION BY {columns} ORDER BY Period
+                                    RANGE BETWEEN 3 PRECEDING AND CURRENT ROW) AS Rolling_4Q
+            FROM base
+            WINDOW by_period AS (PARTITION BY {columns} ORDER BY Period),
+                   by_quarter AS (PARTITION BY {columns}, Quater ORDER BY Year)
+        )
+        SELECT {columns}, Year, Quater, Value,
+               CASE WHEN Previous_Period = Period - 1 AND Previous_Value <> 0
+                    THEN Value * 1.0 / Previous_Value - 1 END AS QoQ,
+               CASE WHEN Year_Ago = Year - 1 AND Year_Ago_Value <> 0
+                    THEN Value * 1.0 / Year_Ago_Value - 1 END AS YoY,
+               Rolling_4Q
+        FROM lagged
+    """
+
+
+def cagr_sql(series):
+    # Over complete years only (all four quarters present for the key).
+    _, keys, _ = SERIES[series]
+    columns = ", ".join(keys)
+    joins = " AND ".join(f"opening.{key} = closing.{key}" for key in keys)
+    return f"""
+        WITH annual AS (
+            SELECT {columns}, Year, SUM(Value) AS Value
+            FROM {table_name(series)} GROUP BY {columns}, Year HAVING COUNT(*) = 4
+        ), bounds AS (
+            SELECT {columns}, MIN(Year) AS First_Year, MAX(Year) AS Last_Year FROM annual GROUP BY {columns}
+        ), opening AS (
+            SELECT annual.* FROM annual JOIN bounds USING ({columns}) WHERE annual.Year = bounds.First_Year
+        ), closing AS (
+            SELECT annual.* FROM annual JOIN bounds USING ({columns}) WHERE annual.Year = bounds.Last_Year
+        )
+        SELECT {", ".join(f"opening.{key} AS {key}" for key in keys)},
+               opening.Year AS First_Year, closing.Year AS Last_Year,
+               opening.Value AS First_Value, closing.Value AS Last_Value,
+               CASE WHEN closing.Year > opening.Year AND opening.Value > 0 AND closing.Value > 0
+                    THEN power(closing.Value * 1.0 / opening.Value, 1.0 / (closing.Year - opening.Year)) - 1
+               END AS CAGR
+        FROM opening JOIN closing ON {joins}
+    """
+
+
+def leaders_sql(series):
+    # Every key at the latest quarter of the series, numbered by YoY and by
+    # CAGR (largest first; keys without a figure get no rank).
+    _, keys, _ = SERIES[series]
+    table = table_name(series)
+    name = " || ' / ' || ".join(f"g.{key}" for key in keys)
+    joins = " AND ".join(f"c.{key} = g.{key}" for key in keys)
+    return f"""
+        WITH latest AS (
+            SELECT {name} AS Name, g.Year, g.Quater, g.Value, g.YoY, c.CAGR
+            FROM {table} g LEFT JOIN {table}_CAGR c ON {joins}
+            WHERE g.Year * 4 + g.Quater = (SELECT MAX(Year * 4 + Quater) FROM {table})
+        )
+        SELECT '{series}' AS Series, Name, Year, Quater, Value, YoY, CAGR,
+               CASE WHEN YoY IS NOT NULL THEN
+                   ROW_NUMBER() OVER (ORDER BY YoY IS NULL, YoY DESC, Name) END AS Rank_YoY,
+               CASE WHEN CAGR IS NOT NULL THEN
+                   ROW_NUMBER() OVER (ORDER BY CAGR IS NULL, CAGR DESC, Name) END AS Rank_CAGR
+        FROM latest
+    """
+
+
+def union_sql(names):
+    return " UNION ALL ".join(f"SELECT * FROM ({leaders_sql(name)})" for name in names)
+
+
+def _ensure_power(conn):
+    # SQLite only has power() when built with its math functions.
+    try:
+        conn.execute("SELECT power(2, 0.5)")
+    except sqlite3.OperationalError:
+        conn.create_function("power", 2, math.pow, deterministic=True)
+
+
+def build_growth(conn, tables=None):
+    # (Re)builds the growth tables of the given source tables (all by
+    # default) and then Growth_Leaders, on an open connection; the caller
+    # owns the transaction. Returns the series that were built.
+    _ensure_power(conn)
+    existing = schema.existing_tables(conn)
+    built = []
+    for series, (source, keys, _) in SERIES.items():
+        if source not in existing or (tables is not None and source not in tables):
+            continue
+        table = table_name(series)
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"CREATE TABLE {table} AS {growth_sql(series)}")
+        conn.execute(f"CREATE INDEX idx_{table} ON {table} ({', '.join(keys)}, Year, Quater)")
+        conn.execute(f"DROP TABLE IF EXISTS {table}_CAGR")
+        conn.execute(f"CREATE TABLE {table}_CAGR AS {cagr_sql(series)}")
+        built.append(series)
+    available = [series for series in SERIES if series in built or table_name(series) in existing]
+    conn.execute(f"DROP TABLE IF EXISTS {LEADERS}")
+    if available:
+        conn.execute(f"CREATE TABLE {LEADERS} AS {union_sql(available)}")
+    return built
+
+
+def rebuild(db_path=config.DB_PATH, tables=None):
+    # Same as build_growth in one transaction of its own.
+    return schema.in_transaction(db_path, build_growth, tables)
+
+
+def ensure(db_path=config.DB_PATH):
+    # Builds the growth tables for an older PhonePe.db that has none, once
+    # per process.
+    schema.once(db_path, LEADERS, lambda path: schema.has_table(path, LEADERS) or rebuild(path))
+
+
+def series(backend, name, value_name=None, **keys):
+    # One series, e.g. series(backend, "State_Type", State="Goa",
+    # Transaction_Name="Merchant payments"), in time order.
+    _, columns, _ = SERIES[name]
+    where = " AND ".join(f"{column} = ?" for column in keys) or "1 = 1"
+    query = f"""
+        SELECT {", ".join(columns)}, Year, Quater, Value AS {value_name or "Value"}, QoQ, YoY, Rolling_4Q
+        FROM {table_name(name)}
+        WHERE {where}
+        ORDER BY {", ".join(columns)}, Year, Quater
+    """
+    return querycache.read_sql(query, backend, tuple(keys.values()))
+
+
+def leaders(backend, name, by="YoY", k=10):
+    # The k fastest growing keys of a series by "YoY" (latest quarter against
+    # a year earlier) or "CAGR", indexed by rank.
+    rank = {"YoY": "Rank_YoY", "CAGR": "Rank_CAGR"}[by]
+    query = f"""
+        SELECT {rank} AS Rank, Name, Year, Quater, Value, YoY, CAGR
+        FROM {LEADERS}
+        WHERE Series = ? AND {rank} <= ?
+        ORDER BY {rank}
+    """
+    return querycache.read_sql(query, backend, (name, int(k))).set_index("Rank")
@@ -0,0 +1,269 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import config
+import jsondecode
+import publish
+import states
+
+
+# Every table in PhonePe.db comes from one folder of the pulse-master tree.
+# A Dataset says where the per-state folders live, which columns the table
+# has and how the rows are pulled out of one quarter's JSON file. The
+# extract functions get the "data" part of the file, restricted to the
+# fields the dataset lists, and yield one tuple per row holding every column
+# after State, Year and Quater.
+Dataset = namedtuple("Dataset", ["kind", "subject", "path", "columns", "extract", "fields"])
+
+KEY_COLUMNS = ["State", "Year", "Quater"]
+
+# SQL type of every column, by name. Storage layers derive their own types
+# from this.
+COLUMN_TYPES = {
+    "State": "TEXT", "Year": "INTEGER", "Quater": "INTEGER",
+    "Transaction_Name": "TEXT", "User_Brand": "TEXT", "District": "TEXT", "Pincode": "TEXT",
+    "Transaction_Count": "INTEGER", "Insurance_Count": "INTEGER", "User_Count": "INTEGER",
+    "Registerd_Users": "INTEGER", "Registred_Users": "INTEGER", "App_Count": "INTEGER",
+    "Transaction_Amount": "REAL", "Insurance_Amount": "REAL", "User_Percentage": "REAL",
+}
+
+
+def _aggregate_transaction(data):
+    for item in data.get("transactionData") or []:
+        instrument = item["paymentInstruments"][0]
+        yield item["name"], instrument["count"], instrument["amount"]
+
+
+def _aggregate_user(data):
+    for item in data.get("usersByDevice") or []:
+        yield item["brand"], item["count"], item["percentage"]
+
+
+def _map_metric(data):
+    for item in data.get("hoverDataList") or []:
+        metric = item["metric"][0]
+        yield item["name"], metric["count"], metric["amount"]
+
+
+def _map_user(data):
+    for district, item in (data.get("hoverData") or {}).items():
+        yield district, item["registeredUsers"], item["appOpens"]
+
+
+def _top_metric(data):
+    for item in data.get("pincodes") or []:
+        yield item["entityName"], item["metric"]["count"], item["metric"]["amount"]
+
+
+def _top_user(data):
+    for item in data.get("pincodes") or []:
+        yield item["name"], item["registeredUsers"]
+
+
+DATASETS = {
+    "Aggregate_Transaction": Dataset(
+        "aggregated", "transaction", "aggregated/transaction/country/india/state",
+        KEY_COLUMNS + ["Transaction_Name", "Transaction_Count", "Transaction_Amount"],
+        _aggregate_transaction, ["transactionData"]),
+    "Aggregate_User": Dataset(
+        "aggregated", "user", "aggregated/user/country/india/state",
+        KEY_COLUMNS + ["User_Brand", "User_Count", "User_Percentage"],
+        _aggregate_user, ["usersByDevice"]),
+    "Aggregate_Insurance": Dataset(
+        "aggregated", "insurance", "aggregated/insurance/country/india/state",
+        KEY_COLUMNS + ["Transaction_Name", "Insurance_Count", "Insurance_Amount"],
+        _aggregate_transaction, ["transactionData"]),
+    "Map_Transaction": Dataset(
+        "map", "transaction", "map/transaction/hover/country/india/state",
+        KEY_COLUMNS + ["District", "Transaction_Count", "Transaction_Amount"],
+        _map_metric, ["hoverDataList"]),
+    "Map_User": Dataset(
+        "map", "user", "map/user/hover/country/india/state",
+        KEY_COLUMNS + ["District", "Registerd_Users", "App_Count"],
+        _map_user, ["hoverData"]),
+    "Map_Insurance": Dataset(
+        "map", "insurance", "map/insurance/hover/country/india/state",
+        KEY_COLUMNS + ["District", "Insurance_Count", "Insurance_Amount"],
+        _map_metric, ["hoverDataList"]),
+    "Top_Transaction": Dataset(
+        "top", "transaction", "top/transaction/country/india/state",
+        KEY_COLUMNS + ["Pincode", "Transaction_Count", "Transaction_Amount"],
+        _top_metric, ["pincodes"]),
+    "Top_User": Dataset(
+        "top", "user", "top/user/country/india/state",
+        KEY_COLUMNS + ["Pincode", "Registred_Users"],
+        _top_user, ["pincodes"]),
+    "Top_Insurance": Dataset(
+        "top", "insurance", "top/insurance/country/india/state",
+        KEY_COLUMNS + ["Pincode", "Insurance_Count", "Insurance_Amount"],
+        _top_metric, ["pincodes"]),
+}
+
+
+def select_datasets(names=None):
+    # Names can be table names ("Map_User"), a kind ("map"), a subject
+    # ("insurance") or both ("top/transaction"). No names means all nine.
+    if not names:
+        return list(DATASETS)
+    selected = []
+    for name in names:
+        wanted = name.lower()
+        matches = [
+            table for table, dataset in DATASETS.items()
+            if wanted in (table.lower(), dataset.kind, dataset.subject,
+                          dataset.kind + "/" + dataset.subject)
+        ]
+        if not matches:
+            raise ValueError(f"Unknown dataset: {name}")
+        selected += [table for table in matches if table not in selected]
+    return selected
+
+
+def _subdirs(path):
+    return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+
+
+def plan_tasks(root=config.SOURCE_ROOT, datasets=None):
+    # One task per (table, state, year) folder. Those are small enough to
+    # balance well across workers and large enough to keep the overhead low.
+    tasks = []
+    for table in select_datasets(datasets):
+        base = os.path.join(root, DATASETS[table].path)
+        if not os.path.isdir(base):
+            continue
+        for state in _subdirs(base):
+            for year in _subdirs(os.path.join(base, state)):
+                tasks.append((table, state, year, os.path.join(base, state, year)))
+    return tasks
+
+
+def quarter_files(folder):
+    # The quarter files are named 1.json .. 4.json.
+    return sorted(
+        (int(name[:-len(".json")]), os.path.join(folder, name))
+        for name in os.listdir(folder) if name.endswith(".json")
+    )
+
+
+def parse_files(task):
+    # task is (table, [(state, year, quarter, path), ...]); returns the rows
+    # of all those files as {column: list of values}.
+    table, files = task
+    dataset = DATASETS[table]
+    columns = {name: [] for name in dataset.columns}
+    values = [columns[name] for name in dataset.columns[3:]]
+    for state, year, quarter, path in files:
+        try:
+            data = jsondecode.load_fields(path, dataset.fields)
+            rows = list(dataset.extract(data))
+        except Exception as error:
+            # Name the file: the decoder's message alone does not.
+            raise ValueError(f"{path}: {error}") from error
+        for row in rows:
+            for column, value in zip(values, row):
+                column.append(value)
+            columns["State"].append(state)
+            columns["Year"].append(int(year))
+            columns["Quater"].append(quarter)
+    return table, columns
+
+
+def parse_year(task):
+    table, state, year, folder = task
+    files = [(state, year, quarter, path) for quarter, path in quarter_files(folder)]
+    return parse_files((table, files))
+
+
+def run_tasks(function, tasks, workers=None, progress=None):
+    # workers=None uses every core, workers=1 runs in this process.
+    # progress, if given, is called as progress(done, total, table, rows)
+    # after every task.
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(tasks) // (workers * 4))
+            return _collect(pool.map(function, tasks, chunksize=chunksize), len(tasks), progress)
+    return _collect(map(function, tasks), len(tasks), progress)
+
+
+def _collect(results, total, progress):
+    collected = []
+    for done, (table, columns) in enumerate(results, 1):
+        collected.append((table, columns))
+        if progress:
+            progress(done, total, table, len(columns["State"]))
+    return collected
+
+
+def merge_results(tables, results):
+    merged = {table: {name: [] for name in DATASETS[table].columns} for table in tables}
+    for table, columns in results:
+        for name, values in columns.items():
+            merged[table][name].extend(values)
+
+    frames = {}
+    for table, columns in merged.items():
+        frame = pd.DataFrame(columns)
+        # Folder slugs -> the state names the map uses (see states.py)
+        frame["State"] = states.canonicalize(frame["State"])
+        frames[table] = frame
+    return frames
+
+
+def run_ingest(root=config.SOURCE_ROOT, datasets=None, workers=None):
+    # Parses the selected datasets and returns {table name: DataFrame}.
+    tables = select_datasets(datasets)
+    results = run_tasks(parse_year, plan_tasks(root, tables), workers)
+    return merge_results(tables, results)
+
+
+def create_table_sql(table, name=None):
+    columns = ", ".join(f"{column} {COLUMN_TYPES[column]}" for column in DATASETS[table].columns)
+    return f"CREATE TABLE {name or table} ({columns})"
+
+
+def bump_version(conn):
+    # PRAGMA user_version is the version stamp readers use to notice that
+    # the tables were rebuilt or updated.
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.execute(f"PRAGMA user_version = {version + 1}")
+
+
+def write_tables(frames, csv_dir=config.DATA_DIR, db_path=config.DB_PATH):
+    # Same outputs the notebook used to produce: one CSV per table and the
+    # matching table in PhonePe.db. Tables are loaded into shadows and
+    # published together (see publish.py), so readers are never blocked.
+    # The CSV files are staged as well and only replace the old ones once
+    # the database is published.
+    staged = []
+    conn = publish.connect(db_path)
+    try:
+        try:
+            for table, frame in frames.items():
+                if csv_dir:
+                    path = os.path.join(csv_dir, table + ".csv")
+                    staged.append((publish.staging_path(path), path))
+                    frame.to_csv(staged[-1][0], index=False)
+                # Typed table instead of whatever to_sql infers from the dtypes.
+                publish.create_shadow(conn, table)
+                marks = ", ".join("?" * len(frame.columns))
+                conn.execute("BEGIN")
+                conn.executemany(f"INSERT INTO {publish.shadow(table)} VALUES ({marks})",
+                                 frame[DATASETS[table].columns].itertuples(index=False, name=None))
+                conn.execute("COMMIT")
+            publish.publish(conn, frames)
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            publish.drop_shadows(conn, frames)
+            for temp, _ in staged:
+                if os.path.exists(temp):
+                    os.remove(temp)
+            raise
+    finally:
+        conn.close()
+    for temp, path in staged:
+        os.replace(temp, path)
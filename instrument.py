@@ -0,0 +1,181 @@
+import sys
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+import config
+
+
+# Timings and row counts for every data load, query and chart of the
+# dashboard. Code under test opens a span:
+#
+#     with instrument.span("query", sql) as info:
+#         frame = pd.read_sql_query(sql, conn)
+#         info["rows"] = len(frame)
+#
+# Spans opened during a Streamlit rerun (between start_run() and
+# finish_run()) are grouped under that run and its page. Every span is kept
+# in a bounded in-process history for the p50/p95 summary of the debug
+# panel, and written as one JSON line to PHONEPE_PROFILE_LOG when it is set.
+# Compare deployments with:
+#
+#     python instrument.py profile-a.jsonl profile-b.jsonl
+
+HISTORY_SIZE = 5000
+# Streamlit calls that send data to the browser.
+RENDER_CALLS = ["plotly_chart", "bar_chart", "line_chart", "dataframe", "table"]
+
+_history = deque(maxlen=HISTORY_SIZE)
+_history_lock = threading.Lock()
+_current = contextvars.ContextVar("instrument_run", default=None)
+
+logger = logging.getLogger("phonepe.profile")
+if config.PROFILE_LOG and not logger.handlers:
+    _handler = logging.FileHandler(config.PROFILE_LOG, encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def rows_of(value):
+    # Row count of a frame or a list of rows; None for figures and stylers.
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+def _emit(record):
+    with _history_lock:
+        _history.append(record)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(record, default=str))
+
+
+@contextmanager
+def span(kind, name, **fields):
+    # Times the block. The yielded dict can be given "rows" or any other
+    # field to record with the timing.
+    info = dict(fields)
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        record = {"kind": kind, "name": name, "ms": round((time.perf_counter() - start) * 1000, 3),
+                  "ts": time.time(), **info}
+        run = _current.get()
+        if run is None:
+            _emit(record)
+        else:
+            run["spans"].append(record)
+
+
+def start_run():
+    # Called at the top of the script; every span until finish_run() belongs
+    # to this rerun.
+    _current.set({"id": uuid.uuid4().hex[:12], "start": time.perf_counter(), "spans": []})
+
+
+def finish_run(page):
+    # Returns the run (id, page, total ms and its spans) and logs it.
+    run = _current.get()
+    if run is None:
+        return None
+    _current.set(None)
+    total = round((time.perf_counter() - run["start"]) * 1000, 3)
+    for record in run["spans"]:
+        _emit(dict(record, run=run["id"], page=page))
+    _emit({"kind": "run", "name": page, "ms": total, "ts": time.time(), "run": run["id"], "page": page,
+           "spans": len(run["spans"])})
+    return {"id": run["id"], "page": page, "ms": total, "spans": run["spans"]}
+
+
+def summarize(records):
+    # {(kind, name): {count, p50, p95, max, rows}} over span records.
+    groups = {}
+    for record in records:
+        groups.setdefault((record["kind"], record["name"]), []).append(record)
+    summary = {}
+    for key, group in groups.items():
+        times = np.array([record["ms"] for record in group])
+        rows = [record["rows"] for record in group if record.get("rows") is not None]
+        summary[key] = {
+            "count": len(group), "p50": float(np.percentile(times, 50)), "p95": float(np.percentile(times, 95)),
+            "max": float(times.max()), "rows": int(np.median(rows)) if rows else None,
+        }
+    return summary
+
+
+def history():
+    with _history_lock:
+        return list(_history)
+
+
+class Timed:
+    # Stands in for a module and times calls to the given functions as
+    # spans of one kind, e.g. every px.* figure build or st.*_chart render:
+    #
+    #     px = instrument.Timed(px, "figure")
+    #     st = instrument.Timed(st, "render", instrument.RENDER_CALLS)
+    #
+    # Everything else is passed through untouched.
+    def __init__(self, module, kind, names=None):
+        self._module = module
+        self._kind = kind
+        self._names = set(names) if names else None
+
+    def __getattr__(self, name):
+        value = getattr(self._module, name)
+        if not callable(value) or (self._names is not None and name not in self._names):
+            return value
+
+        def timed(*args, **kwargs):
+            data = args[0] if args else kwargs.get("data", kwargs.get("data_frame"))
+            with span(self._kind, name, rows=rows_of(data)):
+                return value(*args, **kwargs)
+        return timed
+
+
+def panel(run, stats=None):
+    # Debug sidebar: this rerun's spans and the p50/p95 of everything seen
+    # by this process. stats is {title: dict} of extra counters to show.
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander("Profiling", expanded=True):
+        if run is not None:
+            st.caption(f"Run {run['id']} · {run['page']} · {run['ms']:.0f} ms")
+            spans = pd.DataFrame(run["spans"], columns=["kind", "name", "ms", "rows"])
+            spans["name"] = spans["name"].astype(str).str.slice(0, 60)
+            st.dataframe(spans, hide_index=True)
+        summary = summarize(record for record in history() if record["kind"] != "run")
+        if summary:
+            table = pd.DataFrame([dict(kind=kind, name=str(name)[:60], **values)
+                                  for (kind, name), values in summary.items()])
+            st.dataframe(table.sort_values("p95", ascending=False), hide_index=True)
+        for title, values in (stats or {}).items():
+            st.caption(title)
+            st.json(values, expanded=False)
+
+
+def main(paths):
+    # p50/p95 per (kind, name) of one or more JSON-lines profiles.
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        print(path)
+        for (kind, name), values in sorted(summarize(records).items(), key=lambda item: -item[1]["p95"]):
+            print(f"  {kind:8} p50 {values['p50']:9.2f} ms  p95 {values['p95']:9.2f} ms  "
+                  f"n={values['count']:<6} {str(name)[:80]}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+
+import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+
+# JSON decoding for ingest. Each quarter file is small, so most of the ingest
+# CPU time goes to decoding. Three backends are supported and the first
+# installed one below is used unless PHONEPE_JSON names another:
+#
+#   simdjson  (pysimdjson) parses lazily; only the requested fields under
+#             "data" are turned into Python objects
+#   orjson    builds the whole document, then keeps the requested fields;
+#             several times faster than the stdlib
+#   json      the standard library, always available
+#
+# simdjson comes first because ingest only ever asks for a few fields, and
+# it is the only backend that skips building the rest. The backend is
+# resolved on the first load_fields() call, not at import, so a bad
+# PHONEPE_JSON only affects ingest.
+#
+# load_fields(path, fields) returns the "data" object of a file restricted
+# to those fields, whatever the backend. Compare them on a pulse tree with:
+#
+#     python jsondecode.py E:/PhonePe/pulse-master/data/
+
+PREFERENCE = ["simdjson", "orjson", "json"]
+
+_parser = None
+_default = None
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _pick(data, fields):
+    return {field: data.get(field) for field in fields}
+
+
+def _orjson_fields(path, fields):
+    return _pick(orjson.loads(_read(path))["data"], fields)
+
+
+def _json_fields(path, fields):
+    return _pick(json.loads(_read(path))["data"], fields)
+
+
+def _materialize(value):
+    if isinstance(value, simdjson.Array):
+        return value.as_list()
+    if isinstance(value, simdjson.Object):
+        return value.as_dict()
+    return value
+
+
+def _simdjson_fields(path, fields):
+    # One parser per process, reused for every file. A document is only
+    # valid until the next parse, so the fields are copied out first.
+    global _parser
+    if _parser is None:
+        _parser = simdjson.Parser()
+    data = _parser.parse(_read(path))["data"]
+    return {field: _materialize(data[field]) if field in data else None for field in fields}
+
+
+BACKENDS = {"orjson": _orjson_fields, "simdjson": _simdjson_fields, "json": _json_fields}
+
+
+def available():
+    installed = {"orjson": orjson is not None, "simdjson": simdjson is not None, "json": True}
+    return [name for name in PREFERENCE if installed[name]]
+
+
+def backend_name(name=None):
+    # The backend to use: name, else PHONEPE_JSON, else the first installed
+    # one in PREFERENCE.
+    name = name or config.JSON_BACKEND
+    if name == "auto":
+        return available()[0]
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend: {name}")
+    if name not in available():
+        raise ImportError(f"JSON backend {name} is not installed")
+    return name
+
+
+def load_fields(path, fields, backend=None):
+    global _default
+    if backend is None:
+        if _default is None:
+            _default = backend_name()
+        backend = _default
+    return BACKENDS[backend](path, fields)
+
+
+def throughput(paths, fields, backend, repeat=1):
+    # Files per second and MB per second decoding paths with one backend.
+    size = sum(os.path.getsize(path) for path in paths)
+    decode = BACKENDS[backend_name(backend)]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            decode(path, fields)
+    seconds = time.perf_counter() - start
+    files = len(paths) * repeat
+    return {"files": files, "seconds": seconds, "files_per_sec": files / seconds,
+            "mb_per_sec": size * repeat / seconds / 1e6}
+
+
+def main(argv):
+    import ingest
+
+    root = argv[0] if argv else config.SOURCE_ROOT
+    for table in ingest.DATASETS:
+        paths = [path for *_, folder in ingest.plan_tasks(root, [table])
+                 for _, path in ingest.quarter_files(folder)]
+        if not paths:
+            continue
+        print(f"{table} ({len(paths):,} files)")
+        # Read everything once so the first backend is not timed on a cold cache
+        for path in paths:
+            _read(path)
+        for backend in available():
+            result = throughput(paths, ingest.DATASETS[table].fields, backend)
+            print(f"  {backend:9} {result['files_per_sec']:10,.0f} files/s  {result['mb_per_sec']:7.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,23 @@
+import streamlit as st
+
+
+# st.tabs runs the body of every tab on each rerun and only hides the
+# inactive ones in the browser. tabs() draws the same strip as a horizontal
+# radio and tells the script which tab is open, so only that tab's queries
+# and charts run:
+#
+#     tab1, tab2 = lazytabs.tabs(["Amount", "Volume"])
+#     if tab1:
+#         ...
+#
+# Tab queries go through querycache, so switching back to a tab does not
+# query the database again.
+
+
+def tabs(labels, key=None):
+    # One flag per label, True for the open tab. The choice is kept in
+    # session state under key (derived from the labels by default).
+    key = key or "tabs:" + "|".join(labels)
+    active = st.radio(key, labels, horizontal=True, key=key, label_visibility="collapsed")
+    return [label == active for label in labels]
+
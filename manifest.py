@@ -0,0 +1,167 @@
+import os
+import json
+import hashlib
+
+import pandas as pd
+
+import config
+import growth
+import ingest
+import publish
+import ranking
+import rollups
+import schema
+import states
+
+
+# The manifest remembers every source file that went into PhonePe.db:
+# {relative path: {table, state, year, quarter, size, mtime_ns, hash}}.
+# A later run only parses files whose size/mtime moved AND whose content
+# hash really changed, and only replaces the (State, Year, Quater) rows
+# those files produced.
+
+
+def file_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load(path=config.MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save(entries, path=config.MANIFEST_PATH):
+    # Write to a temporary file first so a crash never leaves half a manifest.
+    temp = path + ".tmp"
+    with open(temp, "w") as f:
+        json.dump(entries, f, indent=1, sort_keys=True)
+    os.replace(temp, path)
+
+
+def scan(root=config.SOURCE_ROOT, datasets=None):
+    entries = {}
+    for table, state, year, folder in ingest.plan_tasks(root, datasets):
+        for quarter, path in ingest.quarter_files(folder):
+            info = os.stat(path)
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            entries[relative] = {
+                "table": table, "state": state, "year": int(year), "quarter": quarter,
+                "size": info.st_size, "mtime_ns": info.st_mtime_ns,
+            }
+    return entries
+
+
+def diff(old, current, root=config.SOURCE_ROOT):
+    # Returns (changed, removed) relative paths and fills in the hash of every
+    # current entry. Files with the same size and mtime keep their old hash
+    # without being read again.
+    changed = []
+    for relative, entry in current.items():
+        before = old.get(relative)
+        if before and before["size"] == entry["size"] and before["mtime_ns"] == entry["mtime_ns"]:
+            entry["hash"] = before["hash"]
+            continue
+        entry["hash"] = file_hash(os.path.join(root, relative))
+        if not before or before["hash"] != entry["hash"]:
+            changed.append(relative)
+    removed = [relative for relative in old if relative not in current]
+    return sorted(changed), sorted(removed)
+
+
+def run_incremental(root=config.SOURCE_ROOT, db_path=config.DB_PATH, manifest_path=config.MANIFEST_PATH,
+                    datasets=None, workers=None, csv_dir=None, parquet_dir=None, progress=None):
+    # Brings PhonePe.db (and the CSV files and Parquet store, when given) up
+    # to date with the source tree and returns {table: number of (State,
+    # Year, Quater) periods replaced}. progress is passed to
+    # ingest.run_tasks.
+    tables = ingest.select_datasets(datasets)
+    old = load(manifest_path)
+    current = scan(root, tables)
+    # Entries of tables that were not asked for stay in the manifest untouched.
+    kept = {relative: entry for relative, entry in old.items() if entry["table"] not in tables}
+    old = {relative: entry for relative, entry in old.items() if entry["table"] in tables}
+
+    # Periods are deleted by canonical state name and typed Year, so bring
+    # an older database to the current schema and names first.
+    if os.path.exists(db_path):
+        schema.migrate(db_path)
+
+    conn = publish.connect(db_path)
+    try:
+        # A table that is not in the database yet has to be parsed in full.
+        missing = set(tables) - schema.existing_tables(conn)
+        if missing:
+            old = {relative: entry for relative, entry in old.items() if entry["table"] not in missing}
+
+        changed, removed = diff(old, current, root)
+        if not changed and not removed:
+            save({**kept, **current}, manifest_path)
+            return {}
+
+        # Group the changed files by state/year folder so the pool gets
+        # the same task sizes as a full run.
+        groups = {}
+        for relative in changed:
+            entry = current[relative]
+            key = (entry["table"], entry["state"], entry["year"])
+            groups.setdefault(key, []).append(
+                (entry["state"], entry["year"], entry["quarter"], os.path.join(root, relative)))
+        tasks = [(table, files) for (table, _, _), files in sorted(groups.items())]
+        frames = ingest.merge_results(tables, ingest.run_tasks(ingest.parse_files, tasks, workers, progress))
+
+        periods = {}
+        for relative in changed:
+            entry = current[relative]
+            periods.setdefault(entry["table"], set()).add((entry["state"], entry["year"], entry["quarter"]))
+        for relative in removed:
+            entry = old[relative]
+            periods.setdefault(entry["table"], set()).add((entry["state"], entry["year"], entry["quarter"]))
+
+        # One transaction for all deletes, inserts and rollups, so readers
+        # see either the old or the new data, never a mix.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table, keys in periods.items():
+                if table in missing:
+                    conn.execute(ingest.create_table_sql(table))
+                else:
+                    conn.executemany(
+                        f"DELETE FROM {table} WHERE State = ? AND Year = ? AND Quater = ?",
+                        [(states.canonical_name(state), year, quarter) for state, year, quarter in sorted(keys)],
+                    )
+                frame = frames[table]
+                marks = ", ".join("?" * len(frame.columns))
+                conn.executemany(f"INSERT INTO {table} VALUES ({marks})", frame.itertuples(index=False, name=None))
+            schema.create_indexes(conn, list(periods))
+            rollups.build_rollups(conn, list(periods))
+            ranking.build_rankings(conn, list(periods))
+            growth.build_growth(conn, list(periods))
+            ingest.bump_version(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        # Only the (Year, Quater) partitions that changed are rewritten. If
+        # this fails the manifest is not saved, so the next run redoes it.
+        if parquet_dir:
+            import storage
+            for table, keys in periods.items():
+                storage.export_periods(conn, table, {(year, quarter) for _, year, quarter in keys}, parquet_dir)
+
+        if csv_dir:
+            os.makedirs(csv_dir, exist_ok=True)
+            for table in periods:
+                with publish.replacing(os.path.join(csv_dir, table + ".csv")) as path:
+                    pd.read_sql_query(f"SELECT * FROM {table}", conn).to_csv(path, index=False)
+    finally:
+        conn.close()
+
+    save({**kept, **current}, manifest_path)
+    return {table: len(keys) for table, keys in periods.items()}
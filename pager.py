@@ -0,0 +1,74 @@
+import ingest
+import querycache
+
+
+# Keyset pagination for the Raw Data viewer. A page is the next PAGE_SIZE
+# rows after the last (sort value, rowid) of the previous page. Unlike
+# LIMIT/OFFSET, deep pages do not read and skip all the earlier rows. In
+# file order (rowid) a page is a single primary-key range scan, and a State
+# filter uses the State index. Sorting on any other column makes SQLite sort
+# the filtered rows. Either way only one page ever reaches the browser.
+
+PAGE_SIZE = 500
+
+
+def _sort_key(table, column):
+    # NULLs cannot be compared in the keyset condition; text columns (only
+    # Pincode has missing values) sort them as "" instead.
+    if column == "rowid":
+        return column
+    if column not in ingest.DATASETS[table].columns:
+        raise ValueError(f"{table} has no column {column}")
+    return f"IFNULL({column}, '')" if ingest.COLUMN_TYPES[column] == "TEXT" else column
+
+
+def _where(table, filters):
+    clauses, params = [], []
+    for column, value in (filters or {}).items():
+        if column not in ingest.DATASETS[table].columns:
+            raise ValueError(f"{table} has no column {column}")
+        clauses.append(f"{column} = ?")
+        params.append(getattr(value, "item", lambda: value)())
+    return clauses, params
+
+
+def page_sql(table, sort="rowid", descending=False, filters=None, after=None, size=PAGE_SIZE):
+    # Returns (sql, params) for one page. after is the key of the last row of
+    # the previous page: (sort value, rowid), or None for the first page.
+    key = _sort_key(table, sort)
+    clauses, params = _where(table, filters)
+    direction, compare = ("DESC", "<") if descending else ("ASC", ">")
+    if after is not None:
+        if sort == "rowid":
+            clauses.append(f"rowid {compare} ?")
+            params.append(after[1])
+        else:
+            clauses.append(f"({key}, rowid) {compare} (?, ?)")
+            params += list(after)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    order = "rowid" if sort == "rowid" else f"{key} {direction}, rowid"
+    columns = ", ".join(ingest.DATASETS[table].columns)
+    sql = (f"SELECT rowid AS _rowid, {key} AS _key, {columns} FROM {table}{where} "
+           f"ORDER BY {order} {direction} LIMIT {int(size) + 1}")
+    return sql, params
+
+
+def fetch_page(pool, table, sort="rowid", descending=False, filters=None, after=None, size=PAGE_SIZE):
+    # Returns (rows, next key). One extra row is read to know whether there
+    # is a next page; next key is None on the last page.
+    sql, params = page_sql(table, sort, descending, filters, after, size)
+    frame = querycache.read_sql(sql, pool, params)
+    following = None
+    if len(frame) > size:
+        frame = frame.iloc[:size]
+        last = frame.iloc[-1]
+        following = (getattr(last["_key"], "item", lambda: last["_key"])(), int(last["_rowid"]))
+    return frame.drop(columns=["_rowid", "_key"]).reset_index(drop=True), following
+
+
+def distinct_values(pool, table, column):
+    # Choices for a filter. State leads an index on every table (see
+    # schema.INDEXES), so the State list is an index-only scan.
+    frame = querycache.read_sql(
+        f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL ORDER BY {column}", pool)
+    return frame[column].tolist()
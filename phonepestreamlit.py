@@ -1,14 +1,41 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
-import pandas as pd
-import requests
-import json
 import plotly.express as px
-import numpy as np
-import sqlite3
 
-conn = sqlite3.connect("PhonePe.db")
-cursor = conn.cursor()
+import backends
+import chartprep
+import config
+import connpool
+import dataaccess
+import figcache
+import growth
+import ingest
+import instrument
+import lazytabs
+import pager
+import prefetch
+import querycache
+import ranking
+import rollups
+import schema
+from dataaccess import load_table
+
+# Every data load, query, figure and chart of this rerun is timed (see
+# instrument.py); ?profile=1 shows the timings in the sidebar
+instrument.start_run()
+px = instrument.Timed(px, "figure")
+st = instrument.Timed(st, "render", instrument.RENDER_CALLS)
+
+# Older databases get the typed schema and indexes, then any missing
+# Rollup_* tables the Analysed Information tabs read and Rank_Index
+schema.ensure(config.DB_PATH)
+rollups.ensure(config.DB_PATH)
+ranking.ensure(config.DB_PATH)
+growth.ensure(config.DB_PATH)
+# Read-only connections shared by every session, one per query
+pool = connpool.get_pool(config.DB_PATH)
+# Engine for the analysis queries, SQLite or DuckDB (see backends.py)
+backend = backends.get_backend()
 
 
 st.set_page_config(page_title="PhonePe Dashboard", layout="wide")
@@ -40,83 +67,33 @@ if selected == "Home":
     *Navigate through the sidebar to find different sections of the dashboard.
     """)
 
-    # Here we are loading all 3 CSV files from Aggregated folder
-    df_txn = pd.read_csv("E:/PhonePe/Aggregate_Transaction.csv")
-    df_user = pd.read_csv("E:/PhonePe/Aggregate_User.csv")
-    df_insurance = pd.read_csv("E:/PhonePe/Aggregate_Insurance.csv")
-
-    # Standardize state names
-
-    for df in [df_txn, df_user, df_insurance]:
-        df["State"] = df["State"].str.title().str.strip()
-
     st.markdown("### Filter Data")
     col1, col2, col3 = st.columns(3)
+    years = sorted(set().union(*(dataaccess.table_years(table) for table, _ in dataaccess.HOME_TABLES.values())))
     with col1:
-        year = st.selectbox("Select Year", sorted(set(df_txn["Year"]).union(df_user["Year"]).union(df_insurance["Year"])))
+        year = st.selectbox("Select Year", years)
     with col2:
         quarter = st.selectbox("Select Quarter", [1, 2, 3, 4])
     with col3:
         data_type = st.selectbox("Select Data Type", ["Transaction", "User", "Insurance"])
     
     # Filter and aggregate based on selection
-    if data_type == "Transaction":
-        filtered = df_txn[(df_txn["Year"] == year) & (df_txn["Quater"] == quarter)]
-        agg = filtered.groupby("State")[["Transaction_Amount", "Transaction_Count"]].sum().reset_index()
-        value_col = "Transaction_Amount"
-    elif data_type == "User":
-        filtered = df_user[(df_user["Year"] == year) & (df_user["Quater"] == quarter)]
-        agg = filtered.groupby("State")[["User_Count"]].sum().reset_index()
-        value_col = "User_Count"
-    elif data_type == "Insurance":
-        filtered = df_insurance[(df_insurance["Year"] == year) & (df_insurance["Quater"] == quarter)]
-        agg = filtered.groupby("State")[["Insurance_Amount", "Insurance_Count"]].sum().reset_index()
-        value_col = "Insurance_Amount"
-# Load India GeoJSON
-    url = 'https://gist.githubusercontent.com/jbrobst/56c13bbbf9d97d187fea01ca62ea5112/raw/e388c4cae20aa53cb5090210a42ebb9b765c0a36/india_states.geojson'
-    india_geo = json.loads(requests.get(url).content)
-
+    # Totals and map are built once per selection and shared (see figcache.py)
+    agg, value_col, fig_map = figcache.home(data_type, year, quarter)
     # Layout split: Map on left, details on right
     left, right = st.columns([2, 1])
     if agg.empty:
         st.warning(" No data available for the selected Year and Quarter.")
     else:
         with left:
-            fig_map = px.choropleth(
-                agg,
-                geojson=india_geo,
-                featureidkey="properties.ST_NM",
-                locations="State",
-                color=value_col,
-                hover_name="State",
-                hover_data={col: True for col in agg.columns if col != "State"},
-                color_continuous_scale="YlGnBu",
-                title=f"{data_type} Data — Q{quarter} {year}"
-            )
-            fig_map.update_geos(
-                visible=False,
-                projection=dict(type='mercator'),
-                lonaxis=dict(range=[68, 98]),
-                lataxis=dict(range=[6, 38])
-                    )
-
-            fig_map.update_layout(
-            title=dict(text="PhonePe Transaction Amount by State", x=0.5),
-            margin={'r': 0, 't': 30, 'l': 0, 'b': 0},
-            height=700,
-            width=1000
-                )
-            fig_map.update_traces(
-                hovertemplate="<b>%{location}</b><br><span style='color:#28a745'><b>Value:</b></span> %{z:,}<extra></extra>"
-                    )
-
             st.plotly_chart(fig_map, use_container_width=True)
 
         with right:
         
+            # Top and bottom 10 are slices of Rank_Index (see ranking.py)
+            table, _ = dataaccess.HOME_TABLES[data_type]
             st.markdown("###Top 10 States by Value")
-            top10 = agg.sort_values(by=value_col, ascending=False).head(10)
-            top10.index = range(1, 11)  # Set index from 1 to 10
+            top10 = ranking.with_columns(ranking.top(backend, table, value_col, "State", year, quarter, 10), agg, "State")
             st.dataframe(
                 top10.style
                 .background_gradient(cmap="Greens")
@@ -124,14 +101,17 @@ if selected == "Home":
             )
 
             st.markdown("### Least 10 States by Value")
-            bottom10 = agg.sort_values(by=value_col, ascending=True).head(10)
-            bottom10.index = range(1, 11)  # Set index from 1 to 10
+            bottom10 = ranking.with_columns(ranking.top(backend, table, value_col, "State", year, quarter, 10, bottom=True),
+                                            agg, "State")
             st.dataframe(
                 bottom10.style
                 .background_gradient(cmap="Reds")
                 .format({value_col: "{:,.0f}"})
             )
- 
+
+    # Warm the previous and next quarter in the background (see prefetch.py)
+    prefetch.home(data_type, year, quarter, [(y, q) for y in years for q in (1, 2, 3, 4)])
+
 elif selected == "Data Information":
     st.subheader("Data Information")
     st.write("""
@@ -150,137 +130,82 @@ elif selected == "Data Information":
   
     #menu_choice = st.radio("Choose Mode", ["Raw Data", "Visualizations"], horizontal=True)
     if menu_choice == "Raw Data":
-        # Load all CSVs
-        df_txn = pd.read_csv("E:/PhonePe/Aggregate_Transaction.csv")
-        df_user = pd.read_csv("E:/PhonePe/Aggregate_User.csv")
-        df_ins = pd.read_csv("E:/PhonePe/Aggregate_Insurance.csv")
-        df_map_txn = pd.read_csv("E:/PhonePe/Map_Transaction.csv")
-        df_map_user = pd.read_csv("E:/PhonePe/Map_User.csv")
-        df_map_ins = pd.read_csv("E:/PhonePe/Map_Insurance.csv")
-        df_top_txn = pd.read_csv("E:/PhonePe/Top_Transaction.csv")
-        df_top_user = pd.read_csv("E:/PhonePe/Top_User.csv")
-        df_top_ins = pd.read_csv("E:/PhonePe/Top_Insurance.csv")
-
         csv_options = {
-            "Transaction Aggregated": df_txn,
-            "User Aggregated": df_user,
-            "Insurance Aggregated": df_ins,
-            "Transaction Map": df_map_txn,
-            "User Map": df_map_user,
-            "Insurance Map": df_map_ins,
-            "Transaction Top": df_top_txn,
-            "User Top": df_top_user,
-            "Insurance Top": df_top_ins
+            "Transaction Aggregated": "Aggregate_Transaction",
+            "User Aggregated": "Aggregate_User",
+            "Insurance Aggregated": "Aggregate_Insurance",
+            "Transaction Map": "Map_Transaction",
+            "User Map": "Map_User",
+            "Insurance Map": "Map_Insurance",
+            "Transaction Top": "Top_Transaction",
+            "User Top": "Top_User",
+            "Insurance Top": "Top_Insurance"
             }
 
         selected_csv = st.selectbox("Select a dataset to view", list(csv_options.keys()))
-        st.dataframe(csv_options[selected_csv]) 
+        table = csv_options[selected_csv]
+
+        # One page at a time, filtered and sorted in the database
+        states = pager.distinct_values(pool, table, "State")
+        years = pager.distinct_values(pool, table, "Year")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            raw_state = st.selectbox("State", ["All"] + states)
+        with col2:
+            raw_year = st.selectbox("Year", ["All"] + years)
+        with col3:
+            sort_by = st.selectbox("Sort by", ["rowid"] + ingest.DATASETS[table].columns,
+                                   format_func=lambda c: "File order" if c == "rowid" else c)
+        with col4:
+            descending = st.checkbox("Descending")
+        raw_filters = {}
+        if raw_state != "All":
+            raw_filters["State"] = raw_state
+        if raw_year != "All":
+            raw_filters["Year"] = raw_year
+
+        # Keys of the pages seen so far, reset whenever the view changes
+        view = (table, raw_state, raw_year, sort_by, descending)
+        if st.session_state.get("raw_view") != view:
+            st.session_state.raw_view = view
+            st.session_state.raw_pages = [None]
+        pages = st.session_state.raw_pages
+        page_df, next_key = pager.fetch_page(pool, table, sort_by, descending, raw_filters, pages[-1])
+        st.dataframe(page_df)
+
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button("Previous", disabled=len(pages) == 1):
+                pages.pop()
+                st.rerun()
+        with info_col:
+            st.caption(f"Page {len(pages)} · {len(page_df)} rows (up to {pager.PAGE_SIZE} per page)")
+        with next_col:
+            if st.button("Next", disabled=next_key is None):
+                pages.append(next_key)
+                st.rerun()
     elif menu_choice == "Visualizations":
         #if menu_choice == "Visualizations":
-                # Load all CSVs
-        df_txn = pd.read_csv("E:/PhonePe/Aggregate_Transaction.csv")
-        df_user = pd.read_csv("E:/PhonePe/Aggregate_User.csv")
-        df_ins = pd.read_csv("E:/PhonePe/Aggregate_Insurance.csv")
-        df_map_txn = pd.read_csv("E:/PhonePe/Map_Transaction.csv")
-        df_map_user = pd.read_csv("E:/PhonePe/Map_User.csv")
-        df_map_ins = pd.read_csv("E:/PhonePe/Map_Insurance.csv")
-        df_top_txn = pd.read_csv("E:/PhonePe/Top_Transaction.csv")
-        df_top_user = pd.read_csv("E:/PhonePe/Top_User.csv")
-        df_top_ins = pd.read_csv("E:/PhonePe/Top_Insurance.csv")    
+        df_keys = load_table("Aggregate_Transaction", ["State", "Year", "Quater"])
 
         st.markdown("### Filter Options")
 
         col1, col2, col3 = st.columns(3)
         with col1:
-            selected_year = st.selectbox("Select Year", sorted(df_txn["Year"].unique()))
+            selected_year = st.selectbox("Select Year", sorted(df_keys["Year"].unique()))
         with col2:
-            selected_quarter = st.selectbox("Select Quarter", sorted(df_txn["Quater"].unique()))
+            selected_quarter = st.selectbox("Select Quarter", sorted(df_keys["Quater"].unique()))
         with col3:
-            selected_state = st.selectbox("Select State", sorted(df_txn["State"].unique()))
-
-        
-        filtered_txn = df_txn[
-            (df_txn["Year"] == selected_year) &
-            (df_txn["Quater"] == selected_quarter) &
-            (df_txn["State"] == selected_state)
-                ]
-        df_ins_filtered = df_ins[
-            (df_ins["State"] == selected_state) &
-            (df_ins["Year"] == selected_year) &
-            (df_ins["Quater"] == selected_quarter)
-                        ]
-        df_district_filtered = df_map_txn[
-            (df_map_txn["State"] == selected_state) &
-            (df_map_txn["Year"] == selected_year) &
-            (df_map_txn["Quater"] == selected_quarter)
-                ]
-
-        fig_district_bar = px.bar(
-            df_district_filtered,
-            x="District",
-            y="Transaction_Count",
-            color="District",
-            title=f"District-wise Transactions in {selected_state} - Q{selected_quarter}, {selected_year}"
-            )
-        st.plotly_chart(fig_district_bar)
-
-        fig_insurance_curve = px.bar(
-            df_ins_filtered,
-            x="Transaction_Name",
-            y="Insurance_Count",
-             color="Insurance_Count",
-            title=f"Insurance Transactions in {selected_state} - Q{selected_quarter}, {selected_year}"
-                )
-        st.plotly_chart(fig_insurance_curve)
-
-        fig_txn_trend = px.bar(
-            filtered_txn,
-            x="Transaction_Name",
-            y="Transaction_Count",
-            color="Transaction_Name",
-            title=f" Transactions in {selected_state} - Q{selected_quarter}, {selected_year}"
-                )
-        st.plotly_chart(fig_txn_trend)
-
-        fig_txn_amount = px.pie(
-                filtered_txn,
-                names="Transaction_Name",
-                values="Transaction_Amount",
-                title=f"Transaction Amount Distribution in {selected_state} - Q{selected_quarter}, {selected_year}"
-                    )
-        st.plotly_chart(fig_txn_amount)
-
-        df_pincode_filtered = df_top_txn[
-            (df_top_txn["State"] == selected_state) &
-            (df_top_txn["Year"] == selected_year) &
-            (df_top_txn["Quater"] == selected_quarter)
-                ]
-
-        filtered_pincode_sorted = df_pincode_filtered.sort_values(by="Transaction_Count", ascending=False).head(15)
-
-        fig_pincode_horizontal = px.bar(
-            filtered_pincode_sorted,
-            x="Transaction_Count",
-            y="Pincode",
-            
-            color="Transaction_Count",
-            title=f"Top 15 Pincode Transactions in {selected_state} - Q{selected_quarter}, {selected_year}",
-            log_x=True  # Optional: makes small values more visible
-                )
-        st.plotly_chart(fig_pincode_horizontal)
+            selected_state = st.selectbox("Select State", sorted(df_keys["State"].unique()))
 
+        # Only the selected state and Year/Quarter partition are read; the
+        # charts are built once per selection and shared (see figcache.py)
+        for fig in figcache.state_charts(selected_state, selected_year, selected_quarter):
+            st.plotly_chart(fig)
 
-        df_yearly = df_txn[df_txn["State"] == selected_state]
-
-        fig_yearly_trend = px.bar(
-            df_yearly,
-            x="Year",
-            y="Transaction_Count",
-            color="Quater",
-            barmode="group",
-            title=f"Yearly Transaction Trends in {selected_state}"
-                )
-        st.plotly_chart(fig_yearly_trend)
+        # Warm the previous and next quarter of this state in the background
+        periods = df_keys[["Year", "Quater"]].drop_duplicates().itertuples(index=False, name=None)
+        prefetch.state_charts(selected_state, selected_year, selected_quarter, periods)
 
 
 elif selected == "Analysed Information":
@@ -318,7 +243,7 @@ elif selected == "Analysed Information":
         st.header("Decoding Transaction Dynamics on PhonePe")
 
         
-        tab1, tab2, tab3, tab4, tab5,tab6 = st.tabs([
+        tab1, tab2, tab3, tab4, tab5,tab6 = lazytabs.tabs([
             "Total Transaction Amount by State",
             "Quarterly Transaction Trends",
             "Transaction Type Breakdown by State",
@@ -328,15 +253,14 @@ elif selected == "Analysed Information":
         
 
         
-        with tab1:
+        if tab1:
             st.subheader("Total Transaction Amount by State")
             query1 = """
-                SELECT State, SUM(Transaction_Amount) AS Total_Transaction_Amount
-                FROM Aggregate_Transaction
-                GROUP BY State
+                SELECT State, Total_Transaction_Amount
+                FROM Rollup_Txn_State
                 ORDER BY Total_Transaction_Amount DESC;
             """
-            df1 = pd.read_sql_query(query1, conn)
+            df1 = querycache.read_sql(query1, backend)
             sorted_df1 = df1.sort_values(by="Total_Transaction_Amount", ascending=False)
             #st.bar_chart(df1.set_index("State"))
             st.bar_chart(sorted_df1.set_index("State"))
@@ -344,35 +268,36 @@ elif selected == "Analysed Information":
             # Show table below
             st.dataframe(sorted_df1)
 
-        with tab2:
+        if tab2:
             st.subheader("Quarterly Transaction Trends by State")
             query2 = """
-                SELECT State, Year, Quater, SUM(Transaction_Amount) AS Total_Transaction_Amount
-                FROM Aggregate_Transaction
-                GROUP BY State, Year, Quater
+                SELECT State, Year, Quater, Total_Transaction_Amount
+                FROM Rollup_Txn_State_Quarter
                 ORDER BY State, Year, Quater;
             """
-            df2 = pd.read_sql_query(query2, conn)
+            df2 = querycache.read_sql(query2, backend)
             
             selected_state = st.selectbox("Choose a State", df2["State"].unique())
-            filtered_df2 = df2[df2["State"] == selected_state]
+            filtered_df2 = growth.series(backend, "State", "Total_Transaction_Amount", State=selected_state)
             filtered_df2["Year_Quarter"] = filtered_df2["Year"].astype(str) + " Q" + filtered_df2["Quater"].astype(str)
 
-            # Set index and plot
-            chart_df = filtered_df2.set_index("Year_Quarter")["Total_Transaction_Amount"]
+            # Set index and plot, with the 4-quarter rolling average
+            chart_df = chartprep.downsample(filtered_df2, ["Year", "Quater"], ["Total_Transaction_Amount", "Rolling_4Q"])
+            chart_df = chart_df.set_index("Year_Quarter")[["Total_Transaction_Amount", "Rolling_4Q"]]
+            chartprep.measure("state_quarterly_trend", chart_df)
             st.line_chart(chart_df)
+            st.dataframe(filtered_df2.drop(columns="Year_Quarter"))
             #st.line_chart(filtered_df2.pivot_table(index=["Year", "Quater"], values="Total_Transaction_Amount"))
             st.dataframe(df2)
 
-        with tab3:
+        if tab3:
             st.subheader("Transaction Type Breakdown by State")
             query3 = """
-                SELECT State, Transaction_Name, SUM(Transaction_Amount) AS Total_Transaction_Amount
-                FROM Aggregate_Transaction
-                GROUP BY State, Transaction_Name
+                SELECT State, Transaction_Name, Total_Transaction_Amount
+                FROM Rollup_Txn_State_Type
                 ORDER BY State, Total_Transaction_Amount DESC;
             """
-            df3 = pd.read_sql_query(query3, conn)
+            df3 = querycache.read_sql(query3, backend)
             
             selected_state = st.selectbox("Select State for Breakdown", df3["State"].unique())
             filtered_df3 = df3[df3["State"] == selected_state]
@@ -380,15 +305,14 @@ elif selected == "Analysed Information":
 
             st.dataframe(df3)
 
-        with tab4:
+        if tab4:
             st.subheader(" Yearly Growth by Transaction Type")
             query4 = """
-                SELECT Year, Transaction_Name, SUM(Transaction_Amount) AS Total_Transaction_Amount
-                FROM Aggregate_Transaction
-                GROUP BY Year, Transaction_Name
+                SELECT Year, Transaction_Name, Total_Transaction_Amount
+                FROM Rollup_Txn_Year_Type
                 ORDER BY Year, Transaction_Name;
             """
-            df4 = pd.read_sql_query(query4, conn)
+            df4 = querycache.read_sql(query4, backend)
             
             selected_type = st.selectbox("Choose Transaction Type", df4["Transaction_Name"].unique())
             filtered_df4 = df4[df4["Transaction_Name"] == selected_type]
@@ -408,31 +332,29 @@ elif selected == "Analysed Information":
 
             st.dataframe(df4)
 
-        with tab5:
+        if tab5:
             st.subheader(" Top Transaction Types Overall")
             query5 = """
-                SELECT Transaction_Name, SUM(Transaction_Amount) AS Total_Transaction_Amount
-                FROM Aggregate_Transaction
-                GROUP BY Transaction_Name
+                SELECT Transaction_Name, Total_Transaction_Amount
+                FROM Rollup_Txn_Type
                 ORDER BY Total_Transaction_Amount DESC;
             """
-            df5 = pd.read_sql_query(query5, conn)
+            df5 = querycache.read_sql(query5, backend)
             
             st.bar_chart(df5.set_index("Transaction_Name"))
 
             st.dataframe(df5)
 
-        with tab6:
+        if tab6:
             
             st.subheader(" Overall Transaction Trend Across India")
 
             query = """
-                SELECT Year, Quater, SUM(Transaction_Amount) AS Total_Transaction_Amount
-                FROM Aggregate_Transaction
-                GROUP BY Year, Quater
+                SELECT Year, Quater, Total_Transaction_Amount
+                FROM Rollup_Txn_Quarter
                 ORDER BY Year, Quater;
             """
-            df = pd.read_sql_query(query, conn)
+            df = querycache.read_sql(query, backend)
 
             # Combine Year and Quarter for timeline
             df["Year_Quarter"] = df["Year"].astype(str) + " Q" + df["Quater"].astype(str)
@@ -443,7 +365,7 @@ elif selected == "Analysed Information":
     if analysis_option == "Device Dominance and User Engagement Analysis":
         st.header("Device Dominance and User Engagement Analysis")
 
-        tab1, tab2, tab3, tab4,tab5 = st.tabs([
+        tab1, tab2, tab3, tab4,tab5 = lazytabs.tabs([
             "Total Users by Device Brand",
             "Device Usage by State",
             "Yearly Trends by Brand",
@@ -452,30 +374,28 @@ elif selected == "Analysed Information":
             ])
 
     #  Tab 1: Total Users by Device Brand
-        with tab1:
+        if tab1:
             st.subheader(" Total Registered Users by Device Brand")
             query1 = """
-                SELECT User_Brand, SUM(User_Count) AS Total_Users
-                FROM Aggregate_User
-                GROUP BY User_Brand
+                SELECT User_Brand, Total_Users
+                FROM Rollup_User_Brand
                 ORDER BY Total_Users DESC;
             """
-            df1 = pd.read_sql_query(query1, conn)
+            df1 = querycache.read_sql(query1, backend)
             
             st.bar_chart(df1.set_index("User_Brand"))
 
             st.dataframe(df1)
 
         #  Tab 2: Device Usage by State
-        with tab2:
+        if tab2:
             st.subheader(" Device Brand Usage by State")
             query2 = """
-                SELECT State, User_Brand, SUM(User_Count) AS Total_Users
-                FROM Aggregate_User
-                GROUP BY State, User_Brand
+                SELECT State, User_Brand, Total_Users
+                FROM Rollup_User_State_Brand
                 ORDER BY State, Total_Users DESC;
             """
-            df2 = pd.read_sql_query(query2, conn)
+            df2 = querycache.read_sql(query2, backend)
             
 
             selected_state = st.selectbox("Choose a State", df2["State"].unique())
@@ -485,15 +405,14 @@ elif selected == "Analysed Information":
             st.dataframe(df2)
 
         # Tab 3: Yearly Trends by Brand
-        with tab3:
+        if tab3:
             st.subheader("Yearly Trends by Device Brand")
             query3 = """
-                SELECT User_Brand, Year, SUM(User_Count) AS Total_Users
-                FROM Aggregate_User
-                GROUP BY User_Brand, Year
+                SELECT User_Brand, Year, Total_Users
+                FROM Rollup_User_Brand_Year
                 ORDER BY User_Brand, Year;
             """
-            df3 = pd.read_sql_query(query3, conn)
+            df3 = querycache.read_sql(query3, backend)
            
             selected_brand = st.selectbox("Choose a Device Brand", df3["User_Brand"].unique())
             filtered_df3 = df3[df3["User_Brand"] == selected_brand]
@@ -503,35 +422,34 @@ elif selected == "Analysed Information":
 
 
         #  Tab 4: Quarterly Growth by Brand
-        with tab4:
+        if tab4:
             st.subheader(" Quarterly Growth by Device Brand")
             query4 = """
-                SELECT User_Brand, Year, Quater, SUM(User_Count) AS Total_Users
-                FROM Aggregate_User
-                GROUP BY User_Brand, Year, Quater
+                SELECT User_Brand, Year, Quater, Total_Users
+                FROM Rollup_User_Brand_Quarter
                 ORDER BY User_Brand, Year, Quater;
             """
-            df4 = pd.read_sql_query(query4, conn)
+            df4 = querycache.read_sql(query4, backend)
             
 
             selected_brand_q = st.selectbox("Select Device Brand", df4["User_Brand"].unique())
-            filtered_df4 = df4[df4["User_Brand"] == selected_brand_q]
+            filtered_df4 = growth.series(backend, "Brand", "Total_Users", User_Brand=selected_brand_q)
+            filtered_df4 = chartprep.downsample(filtered_df4, ["Year", "Quater"], "Total_Users")
             filtered_df4["Year_Quarter"] = filtered_df4["Year"].astype(str) + " Q" + filtered_df4["Quater"].astype(str)
             st.line_chart(filtered_df4.set_index("Year_Quarter")["Total_Users"])
 
             st.dataframe(df4)
 
         
-        with tab5:
+        if tab5:
             st.subheader(" State vs Device Brand Usage")
 
             query5 = """
-                SELECT State, User_Brand, SUM(User_Count) AS Total_Users
-                FROM Aggregate_User
-                GROUP BY State, User_Brand
+                SELECT State, User_Brand, Total_Users
+                FROM Rollup_User_State_Brand
                 ORDER BY State, Total_Users DESC;
             """
-            df5 = pd.read_sql_query(query5, conn)
+            df5 = querycache.read_sql(query5, backend)
             
 
             # Optional filter
@@ -549,7 +467,7 @@ elif selected == "Analysed Information":
         
         st.header("User Engagement and Growth Strategy")
 
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
+        tab1, tab2, tab3, tab4, tab5 = lazytabs.tabs([
             "Registered Users by State",
             "App Opens by State",
             "District-Level Engagement",
@@ -558,15 +476,14 @@ elif selected == "Analysed Information":
         ])
 
         #  Tab 1: Registered Users by State
-        with tab1:
+        if tab1:
             st.subheader(" Total Registered Users by State")
             query1 = """
-                SELECT State, SUM(Registerd_Users) AS Total_Registered
-                FROM Map_User
-                GROUP BY State
+                SELECT State, Total_Registered
+                FROM Rollup_MapUser_State
                 ORDER BY Total_Registered DESC;
             """
-            df1 = pd.read_sql_query(query1, conn)
+            df1 = querycache.read_sql(query1, backend)
         
           
             st.bar_chart(df1.set_index("State"))
@@ -574,16 +491,15 @@ elif selected == "Analysed Information":
             st.dataframe(df1)
 
         #  Tab 2: App Opens by State
-        with tab2:
+        if tab2:
             st.subheader(" Total App Opens by State")
             
             query2 = """
-                SELECT State, SUM(App_Count) AS Total_App_Counts
-                FROM Map_User
-                GROUP BY State
+                SELECT State, Total_App_Counts
+                FROM Rollup_MapUser_State
                 ORDER BY Total_App_Counts DESC;
             """
-            df2 = pd.read_sql_query(query2, conn)
+            df2 = querycache.read_sql(query2, backend)
 
             
             st.bar_chart(df2.set_index("State"))
@@ -591,33 +507,34 @@ elif selected == "Analysed Information":
             st.dataframe(df2)
 
         # Tab 3: District-Level Engagement
-        with tab3:
+        if tab3:
             st.subheader(" District-Level Engagement")
             query3 = """
-                SELECT State, District, SUM(Registerd_Users) AS Total_Registered, SUM(App_Count) AS Total_App_Counts
-                FROM Map_User
-                GROUP BY State, District
+                SELECT State, District, Total_Registered, Total_App_Counts
+                FROM Rollup_MapUser_District
                 ORDER BY State, Total_App_Counts DESC;
             """
-            df3 = pd.read_sql_query(query3, conn)
+            df3 = querycache.read_sql(query3, backend)
            
 
             selected_state = st.selectbox("Choose a State", df3["State"].unique())
             filtered_df3 = df3[df3["State"] == selected_state]
-            st.bar_chart(filtered_df3.set_index("District")[["Total_App_Counts", "Total_Registered"]])
+            # Top districts plus "Others" (see chartprep.py)
+            chart_df3 = chartprep.top_k(filtered_df3, "District", ["Total_App_Counts", "Total_Registered"])
+            chartprep.measure("district_engagement", chart_df3)
+            st.bar_chart(chart_df3.set_index("District"))
 
             st.dataframe(df3)
 
         # Tab 4: Engagement Ratio by District
-        with tab4:
+        if tab4:
             st.subheader(" Engagement Ratio by District")
             query4 = """
-                SELECT State, District, SUM(App_Count)*1.0 / SUM(Registerd_Users) AS Engagement_Rate
-                FROM Map_User
-                GROUP BY State, District
+                SELECT State, District, Engagement_Rate
+                FROM Rollup_MapUser_District
                 ORDER BY Engagement_Rate DESC;
             """
-            df4 = pd.read_sql_query(query4, conn)
+            df4 = querycache.read_sql(query4, backend)
             
 
             top_districts = df4.head(20)
@@ -626,15 +543,14 @@ elif selected == "Analysed Information":
             st.dataframe(df4)
 
         #  Tab 5: Quarterly Growth in App Opens
-        with tab5:
+        if tab5:
             st.subheader(" Quarterly Growth in App Opens")
             query5 = """
-                SELECT State, Year, Quater, SUM(App_Count) AS Total_App_Counts
-                FROM Map_User
-                GROUP BY State, Year, Quater
+                SELECT State, Year, Quater, Total_App_Counts
+                FROM Rollup_MapUser_State_Quarter
                 ORDER BY State, Year, Quater;
             """
-            df5 = pd.read_sql_query(query5, conn)
+            df5 = querycache.read_sql(query5, backend)
             
 
             selected_state_q = st.selectbox("Select State", df5["State"].unique())
@@ -651,89 +567,89 @@ elif selected == "Analysed Information":
         This section explores transaction trends, regional growth, and high-performing pincodes to uncover opportunities for expansion and deeper market penetration.
         """)
 
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
+        tab1, tab2, tab3, tab4, tab5, tab6 = lazytabs.tabs([
             "Total Transaction by State",
             "Yearly Growth by State",
             "Quarterly Trends by Type",
             "Top Pincodes by Amount",
-            "State-Wise Pincode Performance"
+            "State-Wise Pincode Performance",
+            "Fastest Growing"
         ])
 
         #  Tab 1: Total Transaction Amount by State
-        with tab1:
+        if tab1:
             query1 = """
-                SELECT State, SUM(Transaction_Amount) AS Total_Transaction_Amount
-                FROM Aggregate_Transaction
-                GROUP BY State
+                SELECT State, Total_Transaction_Amount
+                FROM Rollup_Txn_State
                 ORDER BY State, Total_Transaction_Amount DESC;
             """
-            df1 = pd.read_sql_query(query1, conn)
+            df1 = querycache.read_sql(query1, backend)
             
             st.bar_chart(df1.set_index("State"))
 
             st.dataframe(df1)
 
         #  Tab 2: Yearly Growth by State
-        with tab2:
+        if tab2:
             query2 = """
-                SELECT State, Year, SUM(Transaction_Amount) AS Total_Transaction_Amount
-                FROM Aggregate_Transaction
-                GROUP BY State, Year
+                SELECT State, Year, Total_Transaction_Amount
+                FROM Rollup_Txn_State_Year
                 ORDER BY State, Year;
             """
-            df2 = pd.read_sql_query(query2, conn)
+            df2 = querycache.read_sql(query2, backend)
             
             st.line_chart(df2.pivot(index="Year", columns="State", values="Total_Transaction_Amount"))
 
             st.dataframe(df2)
 
         #  Tab 3: Quarterly Trends by Transaction Type
-        with tab3:
+        if tab3:
             query3 = """
-                SELECT State, Transaction_Name, Year, Quater, SUM(Transaction_Amount) AS Total_Transaction_Amount
-                FROM Aggregate_Transaction
-                GROUP BY State, Transaction_Name, Year, Quater
+                SELECT State, Transaction_Name, Year, Quater, Total_Transaction_Amount
+                FROM Rollup_Txn_State_Type_Quarter
                 ORDER BY State, Transaction_Name, Year, Quater;
             """
-            df3 = pd.read_sql_query(query3, conn)
+            df3 = querycache.read_sql(query3, backend)
             
             st.markdown("#### 📈 Sample Trend (Choose State & Type)")
             states = df3["State"].unique()
             types = df3["Transaction_Name"].unique()
             selected_state = st.selectbox("Select State", states)
             selected_type = st.selectbox("Select Transaction Type", types)
-            filtered = df3[(df3["State"] == selected_state) & (df3["Transaction_Name"] == selected_type)]
-            chart_data = filtered.pivot_table(index=["Year", "Quater"], values="Total_Transaction_Amount", aggfunc="sum").reset_index()
+            filtered = growth.series(backend, "State_Type", "Total_Transaction_Amount",
+                                     State=selected_state, Transaction_Name=selected_type)
+            chart_data = chartprep.downsample(filtered, ["Year", "Quater"], "Total_Transaction_Amount")
+            chart_data = chart_data[["Year", "Quater", "Total_Transaction_Amount"]]
             st.line_chart(chart_data)
+            st.dataframe(filtered)
 
             st.dataframe(df3)
 
         #  Tab 4: Top Pincodes by Transaction Amount
-        with tab4:
-            df_check = pd.read_sql_query("SELECT * FROM Top_Transaction LIMIT 5;", conn)
+        if tab4:
+            df_check = querycache.read_sql("SELECT * FROM Top_Transaction LIMIT 5;", backend)
             st.write(df_check.columns.tolist())
 
             query4 = """
-                SELECT Pincode, SUM(Transaction_Amount) AS Total_Amount
-                FROM Top_Transaction
-                GROUP BY Pincode
+                SELECT Pincode, Total_Amount
+                FROM Rollup_TopTxn_Pincode
                 ORDER BY Total_Amount DESC;
             """
-            df4 = pd.read_sql_query(query4, conn)
+            df4 = querycache.read_sql(query4, backend)
             
-            st.bar_chart(df4.set_index("Pincode").head(10))
+            st.bar_chart(ranking.top(backend, "Top_Transaction", "Transaction_Amount", "Pincode",
+                                     value_name="Total_Amount").set_index("Pincode"))
 
             st.dataframe(df4)
 
         # Tab 5: State-Wise Pincode Performance
-        with tab5:
+        if tab5:
             query5 = """
-                SELECT State, Pincode, SUM(Transaction_Amount) AS Total_Amount
-                FROM Top_Transaction
-                GROUP BY State, Pincode
+                SELECT State, Pincode, Total_Amount
+                FROM Rollup_TopTxn_State_Pincode
                 ORDER BY State, Total_Amount DESC;
             """
-            df5 = pd.read_sql_query(query5, conn)       
+            df5 = querycache.read_sql(query5, backend)       
             st.markdown("#### Select State to View Top Pincodes")
             selected_state = st.selectbox("Choose State", df5["State"].unique())
             filtered_df = df5[df5["State"] == selected_state]
@@ -741,6 +657,19 @@ elif selected == "Analysed Information":
 
             st.dataframe(df5)
 
+        # Tab 6: Fastest Growing (from the growth tables)
+        if tab6:
+            series = st.selectbox("Leaderboard", list(growth.SERIES), format_func=growth.LABELS.get)
+            rank_by = st.radio("Rank by", ["YoY", "CAGR"], horizontal=True,
+                               captions=["Latest quarter vs. a year earlier", "Between the first and last full years"])
+            leaders = growth.leaders(backend, series, rank_by, 10)
+            if leaders.empty:
+                st.info("Not enough history to rank growth yet.")
+            else:
+                st.markdown(f"#### Top 10 by {rank_by} — Q{leaders['Quater'].iloc[0]} {leaders['Year'].iloc[0]}")
+                st.bar_chart(leaders.set_index("Name")[rank_by] * 100)
+                st.dataframe(leaders)
+
 
         
 
@@ -751,7 +680,7 @@ elif selected == "Analysed Information":
         This helps uncover user engagement patterns and guide targeted marketing efforts.
         """)
 
-        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+        tab1, tab2, tab3, tab4, tab5, tab6 = lazytabs.tabs([
             "Top States by Amount",
             "Top States by Volume",
             "Top Districts by Amount",
@@ -761,86 +690,72 @@ elif selected == "Analysed Information":
         ])
 
         # Tab 1: Top States by Transaction Amount
-        with tab1:
+        if tab1:
             query1 = """
-                SELECT State, SUM(Transaction_Amount) AS Total_Transaction_Amount
-                FROM Aggregate_Transaction
-                GROUP BY State
+                SELECT State, Total_Transaction_Amount
+                FROM Rollup_Txn_State
                 ORDER BY Total_Transaction_Amount DESC;
             """
-            df1 = pd.read_sql_query(query1, conn)
+            df1 = querycache.read_sql(query1, backend)
             
-            st.bar_chart(df1.set_index("State").head(10))
+            st.bar_chart(ranking.top(backend, "Aggregate_Transaction", "Transaction_Amount", "State",
+                                     value_name="Total_Transaction_Amount").set_index("State"))
 
             st.dataframe(df1)
 
         # Tab 2: Top States by Transaction Volume
-        with tab2:
+        if tab2:
             query2 = """
-                SELECT State, SUM(Transaction_Count) AS Total_Transaction_Count
-                FROM Aggregate_Transaction
-                GROUP BY State
+                SELECT State, Total_Transaction_Count
+                FROM Rollup_Txn_State
                 ORDER BY Total_Transaction_Count DESC;
             """
-            df2 = pd.read_sql_query(query2, conn)
+            df2 = querycache.read_sql(query2, backend)
             
-            st.bar_chart(df2.set_index("State").head(10))
+            st.bar_chart(ranking.top(backend, "Aggregate_Transaction", "Transaction_Count", "State",
+                                     value_name="Total_Transaction_Count").set_index("State"))
 
             st.dataframe(df2)
 
         # Tab 3: Top Districts by Transaction Amount
-        with tab3:
+        if tab3:
             query3 = """
-                SELECT District, SUM(Transaction_Amount) AS Total_Amount
-                FROM Map_Transaction
-                GROUP BY District
+                SELECT District, Total_Amount
+                FROM Rollup_MapTxn_District
                 ORDER BY Total_Amount DESC;
             """
-            df3 = pd.read_sql_query(query3, conn)
+            df3 = querycache.read_sql(query3, backend)
             
-            st.bar_chart(df3.set_index("District").head(10))
+            st.bar_chart(ranking.top(backend, "Map_Transaction", "Transaction_Amount", "District",
+                                     value_name="Total_Amount").set_index("District"))
 
             st.dataframe(df3)
 
         # Tab 4: Top Districts by Transaction Volume
-        with tab4:
+        if tab4:
             query4 = """
-                SELECT District, SUM(Transaction_Count) AS Total_Count
-                FROM Map_Transaction
-                GROUP BY District
+                SELECT District, Total_Count
+                FROM Rollup_MapTxn_District
                 ORDER BY Total_Count DESC;
             """
-            df4 = pd.read_sql_query(query4, conn)
+            df4 = querycache.read_sql(query4, backend)
           
-            st.bar_chart(df4.set_index("District").head(10))
+            st.bar_chart(ranking.top(backend, "Map_Transaction", "Transaction_Count", "District",
+                                     value_name="Total_Count").set_index("District"))
 
             st.dataframe(df4)
 
         # Tab 5: Top Pincodes by Transaction Amount
-        with tab5:
-            query5 = """
-                SELECT Pincode, SUM(Transaction_Amount) AS Total_Amount
-                FROM Top_Transaction
-                GROUP BY Pincode
-                ORDER BY Total_Amount DESC
-                LIMIT 10;
-            """
-            df5 = pd.read_sql_query(query5, conn)
+        if tab5:
+            df5 = ranking.top(backend, "Top_Transaction", "Transaction_Amount", "Pincode", value_name="Total_Amount")
            
             st.bar_chart(df5.set_index("Pincode"))
 
             st.dataframe(df5)
 
         # Tab 6: Top Pincodes by Transaction Volume
-        with tab6:
-            query6 = """
-                SELECT Pincode, SUM(Transaction_Count) AS Total_Count
-                FROM Top_Transaction
-                GROUP BY Pincode
-                ORDER BY Total_Count DESC
-                LIMIT 10;
-            """
-            df6 = pd.read_sql_query(query6, conn)
+        if tab6:
+            df6 = ranking.top(backend, "Top_Transaction", "Transaction_Count", "Pincode", value_name="Total_Count")
             
             st.bar_chart(df6.set_index("Pincode"))
 
@@ -852,7 +767,7 @@ elif selected == "Analysed Information":
         This helps understand user engagement in the insurance sector and informs strategic decisions.
         """)
 
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
+        tab1, tab2, tab3, tab4, tab5 = lazytabs.tabs([
             "Top States by Insurance Count",
             "Top Districts by Insurance Count",
             "Top Pincodes by Insurance Count",
@@ -861,14 +776,13 @@ elif selected == "Analysed Information":
         ])
 
         # Tab 1: Top States by Insurance Count
-        with tab1:
+        if tab1:
             query1 = """
-                SELECT State, SUM(Insurance_Count) AS Total_Insurance_Transactions
-                FROM Aggregate_Insurance
-                GROUP BY State
+                SELECT State, Total_Insurance_Transactions
+                FROM Rollup_Ins_State
                 ORDER BY Total_Insurance_Transactions DESC;
             """
-            df1 = pd.read_sql_query(query1, conn)
+            df1 = querycache.read_sql(query1, backend)
             
             st.bar_chart(df1.set_index("State"))
 
@@ -877,42 +791,37 @@ elif selected == "Analysed Information":
             
 
         #  Tab 2: Top Districts by Insurance Count
-        with tab2:
+        if tab2:
             query2 = """
-                SELECT District, SUM(Insurance_Count) AS Total_Insurance_Transactions
-                FROM Map_Insurance
-                GROUP BY District
+                SELECT District, Total_Insurance_Transactions
+                FROM Rollup_MapIns_District
                 ORDER BY Total_Insurance_Transactions DESC;
             """
-            df2 = pd.read_sql_query(query2, conn)
+            df2 = querycache.read_sql(query2, backend)
             
-            st.bar_chart(df2.set_index("District").head(10))
+            st.bar_chart(ranking.top(backend, "Map_Insurance", "Insurance_Count", "District",
+                                     value_name="Total_Insurance_Transactions").set_index("District"))
             st.dataframe(df2)
 
         #  Tab 3: Top Pincodes by Insurance Count
-        with tab3:
-            query3 = """
-                SELECT Pincode, SUM(Insurance_Count) AS Total_Insurance_Transactions
-                FROM Top_Insurance
-                GROUP BY Pincode
-                ORDER BY Total_Insurance_Transactions DESC
-                LIMIT 10;
-            """
-            df3 = pd.read_sql_query(query3, conn)
+        if tab3:
+            df3 = ranking.top(backend, "Top_Insurance", "Insurance_Count", "Pincode",
+                              value_name="Total_Insurance_Transactions")
             
             st.bar_chart(df3.set_index("Pincode"))
 
             st.dataframe(df3)
 
+        # Tabs 4 and 5 share this query
+        query4 = """
+            SELECT State, Year, Quater, Total_Insurance_Transactions
+            FROM Rollup_Ins_State_Quarter
+            ORDER BY State, Year, Quater;
+        """
+
         #  Tab 4: State-Wise Insurance Trend Over Time
-        with tab4:
-            query4 = """
-                SELECT State, Year, Quater, SUM(Insurance_Count) AS Total_Insurance_Transactions
-                FROM Aggregate_Insurance
-                GROUP BY State, Year, Quater
-                ORDER BY State, Year, Quater;
-            """
-            df4 = pd.read_sql_query(query4, conn)
+        if tab4:
+            df4 = querycache.read_sql(query4, backend)
             
             selected_state = st.selectbox("Choose State", df4["State"].unique())
             filtered_df = df4[df4["State"] == selected_state]
@@ -922,7 +831,8 @@ elif selected == "Analysed Information":
             st.dataframe(df4)
 
         #  Tab 5: Year–Quarter Breakdown Across States
-        with tab5:
+        if tab5:
+            df4 = querycache.read_sql(query4, backend)
             year = st.selectbox("Select Year", sorted(df4["Year"].unique()))
             quarter = st.selectbox("Select Quarter", sorted(df4["Quater"].unique()))
             filtered_yq = df4[(df4["Year"] == year) & (df4["Quater"] == quarter)]
@@ -930,7 +840,6 @@ elif selected == "Analysed Information":
             st.bar_chart(filtered_yq.set_index("State"))
 
             st.dataframe(filtered_yq.sort_values(by="Total_Insurance_Transactions", ascending=False))
-    conn.commit()
 
 
 
@@ -1007,9 +916,16 @@ elif selected == "Report":
         This dashboard gives a full picture of how PhonePe is being used across India. It shows where things are working well and where there’s room to grow. These insights can help guide future plans—for payments, insurance, and reaching new regions.
         """)
 
-conn.commit()
-conn.close()
 
 
 
-            
\ No newline at end of file
+            
+
+
+# Profiling panel for this rerun
+profile_run = instrument.finish_run(selected)
+if config.PROFILE_PANEL or st.query_params.get("profile") == "1":
+    instrument.panel(profile_run, {"Query cache": querycache.stats(), "Connection pool": pool.stats(),
+                                   "Table cache": dataaccess.cache_stats(),
+                                   "Figure cache": figcache.stats(), "Prefetch": prefetch.stats(),
+                                   "Chart payloads": chartprep.stats()})
@@ -0,0 +1,322 @@
+import os
+import csv
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import config
+import ingest
+import manifest
+import publish
+import states
+
+
+# Streaming version of the ingest: parsed rows come out of a generator one
+# state/year folder at a time and are handed to one or more sinks, so no
+# table is ever held in memory as a whole. The SQLite sink writes bounded
+# batches with executemany into shadow tables, one explicit transaction per
+# batch, and swaps them in at the end (see publish.py); CSV and Parquet are
+# optional extra sinks on the same stream.
+#
+# Every sink stages its output and has three steps: prepare() finishes
+# everything that can fail, close() publishes, abort() throws the staged
+# output away. All sinks are prepared before the first one publishes, so
+# nothing is replaced when a run fails.
+
+DEFAULT_BATCH_SIZE = 5000
+
+def iter_rows(root=config.SOURCE_ROOT, datasets=None, workers=None, tasks=None):
+    # Yields (table, list of row tuples), one item per state/year folder.
+    # At most two tasks per worker are in flight, so a slow sink holds the
+    # parsers back instead of letting parsed rows pile up in memory.
+    if tasks is None:
+        tasks = ingest.plan_tasks(root, datasets)
+    names = {}
+
+    def rows(result):
+        table, columns = result
+        slugs = columns["State"]
+        for slug in set(slugs) - names.keys():
+            names[slug] = states.canonical_name(slug)
+        columns["State"] = [names[slug] for slug in slugs]
+        return table, list(zip(*columns.values()))
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield rows(ingest.parse_year(task))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = iter(tasks)
+        running = deque(pool.submit(ingest.parse_year, task) for task in islice(pending, workers * 2))
+        while running:
+            # Results are handed on in task order so the output is deterministic.
+            result = running.popleft().result()
+            task = next(pending, None)
+            if task is not None:
+                running.append(pool.submit(ingest.parse_year, task))
+            yield rows(result)
+
+
+class SQLiteSink:
+    # Loads into shadow tables and publishes them all at once on close (see
+    # publish.py), so the dashboard keeps reading the old tables meanwhile.
+    # Pragmas are tuned for one bulk writer: no fsync per batch and a big
+    # page cache.
+    def __init__(self, db_path=config.DB_PATH, batch_size=DEFAULT_BATCH_SIZE):
+        self.conn = publish.connect(db_path)
+        self.batch_size = batch_size
+        self.buffers = {}
+        for pragma in ("synchronous = OFF", "temp_store = MEMORY", "cache_size = -65536"):
+            self.conn.execute("PRAGMA " + pragma)
+
+    def open(self, table):
+        self.buffers[table] = []
+        publish.create_shadow(self.conn, table)
+
+    def write(self, table, rows):
+        buffer = self.buffers[table]
+        buffer.extend(rows)
+        while len(buffer) >= self.batch_size:
+            self._flush(table, buffer[:self.batch_size])
+            del buffer[:self.batch_size]
+
+    def _flush(self, table, rows):
+        if not rows:
+            return
+        marks = ", ".join("?" * len(rows[0]))
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany(f"INSERT INTO {publish.shadow(table)} VALUES ({marks})", rows)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def prepare(self):
+        for table, buffer in self.buffers.items():
+            self._flush(table, buffer)
+            buffer.clear()
+
+    def close(self):
+        try:
+            # The swap, indexes, rollups and version stamp are one durable
+            # transaction, so a reader never sees the new stamp with old rollups.
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+            publish.publish(self.conn, self.buffers)
+        except BaseException:
+            publish.drop_shadows(self.conn, self.buffers)
+            raise
+        finally:
+            self.conn.close()
+
+    def abort(self):
+        # The load failed: the live tables stay as they were.
+        try:
+            publish.drop_shadows(self.conn, self.buffers)
+        finally:
+            self.conn.close()
+
+
+class CSVSink:
+    # Each file is written next to the old one and replaces it on close.
+    def __init__(self, csv_dir=config.DATA_DIR):
+        os.makedirs(csv_dir, exist_ok=True)
+        self.csv_dir = csv_dir
+        self.files = {}
+
+    def open(self, table):
+        path = os.path.join(self.csv_dir, table + ".csv")
+        f = open(publish.staging_path(path), "w", newline="", encoding="utf-8")
+        writer = csv.writer(f)
+        writer.writerow(ingest.DATASETS[table].columns)
+        self.files[table] = (f, writer, path)
+
+    def write(self, table, rows):
+        self.files[table][1].writerows(rows)
+
+    def prepare(self):
+        for f, _, _ in self.files.values():
+            f.close()
+
+    def close(self):
+        try:
+            for table, (f, _, path) in list(self.files.items()):
+                os.replace(f.name, path)
+                del self.files[table]
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        for f, _, _ in self.files.values():
+            f.close()
+            if os.path.exists(f.name):
+                os.remove(f.name)
+
+
+ABORT = object()
+
+
+class Aborted(Exception):
+    pass
+
+
+class ParquetSink:
+    # Needs pyarrow. Tables arrive one after another, and the current one is
+    # staged for the partitioned Parquet store by a writer thread fed through
+    # a short queue of record batches. Only one table is written at a time:
+    # Arrow reads each batch iterator on its own I/O threads. The staged
+    # tables are published together in close().
+    def __init__(self, parquet_dir=config.PARQUET_DIR, batch_size=DEFAULT_BATCH_SIZE):
+        import storage
+        self.storage = storage
+        self.parquet_dir = parquet_dir
+        self.batch_size = batch_size
+        self.tables = []
+        self.current = None
+        self.buffer = []
+        self.queue = None
+        self.thread = None
+        self.errors = []
+        self.staged = {}
+
+    def open(self, table):
+        self.tables.append(table)
+
+    def _batches(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                return
+            if batch is ABORT:
+                raise Aborted()
+            yield batch
+
+    def _start(self, table):
+        self._finish()
+        self.current = table
+        self.queue = queue.Queue(maxsize=4)
+        batches = self._batches()
+        self.thread = threading.Thread(target=self._write, args=(table, batches), daemon=True)
+        self.thread.start()
+
+    def _write(self, table, batches):
+        try:
+            self.staged[table] = self.storage.stage_batches(table, batches, self.parquet_dir)
+        except Exception as error:
+            self.errors.append(error)
+            # Keep draining so the producer never blocks on a full queue.
+            try:
+                for _ in batches:
+                    pass
+            except Aborted:
+                pass
+
+    def _finish(self):
+        if self.current is None:
+            return
+        self._flush()
+        self.queue.put(None)
+        self.thread.join()
+        self.tables.remove(self.current)
+        self.current = None
+
+    def write(self, table, rows):
+        if table != self.current:
+            self._start(table)
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        self.queue.put(self.storage.record_batch(self.current, self.buffer))
+        self.buffer.clear()
+
+    def prepare(self):
+        self._finish()
+        if self.errors:
+            raise self.errors[0]
+        # Tables without a single row still get an (empty) directory.
+        for table in self.tables:
+            self.staged[table] = self.storage.stage_batches(table, iter(()), self.parquet_dir)
+        self.tables.clear()
+
+    def close(self):
+        try:
+            for table, staging in list(self.staged.items()):
+                self.storage.publish_staged(table, staging, self.parquet_dir)
+                del self.staged[table]
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        # Stops the table being written and drops every staged one; the
+        # published tables stay as they were.
+        if self.current is not None:
+            self.queue.put(ABORT)
+            self.thread.join()
+            self.current = None
+        for staging in self.staged.values():
+            self.storage.discard_staged(staging)
+        self.staged.clear()
+
+
+def run_pipeline(root=config.SOURCE_ROOT, db_path=config.DB_PATH, datasets=None, workers=None,
+                 batch_size=DEFAULT_BATCH_SIZE, csv_dir=None, parquet_dir=None, manifest_path=None,
+                 progress=None):
+    # Streams the selected datasets into PhonePe.db (and optionally CSV and
+    # Parquet files). Returns {table: rows written}. When manifest_path is
+    # given the manifest is refreshed so later incremental runs start here.
+    # progress, if given, is called as progress(done, total, table, rows)
+    # after every state/year folder.
+    tables = ingest.select_datasets(datasets)
+    tasks = ingest.plan_tasks(root, tables)
+    if manifest_path:
+        # Sizes, mtimes and hashes are taken before anything is parsed, so a
+        # file that changes during the run no longer matches its entry and
+        # the next incremental run picks it up.
+        entries = manifest.scan(root, tables)
+        manifest.diff({}, entries, root)
+    sinks = []
+    if db_path:
+        sinks.append(SQLiteSink(db_path, batch_size))
+    if csv_dir:
+        sinks.append(CSVSink(csv_dir))
+    if parquet_dir:
+        sinks.append(ParquetSink(parquet_dir, batch_size))
+
+    counts = {table: 0 for table in tables}
+    pending = list(sinks)
+    try:
+        for sink in sinks:
+            for table in tables:
+                sink.open(table)
+        for done, (table, rows) in enumerate(iter_rows(root, tables, workers, tasks), 1):
+            for sink in sinks:
+                sink.write(table, rows)
+            counts[table] += len(rows)
+            if progress:
+                progress(done, len(tasks), table, len(rows))
+        for sink in sinks:
+            sink.prepare()
+        while pending:
+            pending.pop(0).close()
+    except BaseException:
+        # Nothing more is published from a failed or interrupted run; a sink
+        # that fails to close cleans up after itself.
+        for sink in pending:
+            sink.abort()
+        raise
+
+    if manifest_path:
+        kept = {path: entry for path, entry in manifest.load(manifest_path).items()
+                if entry["table"] not in tables}
+        manifest.save({**kept, **entries}, manifest_path)
+    return counts
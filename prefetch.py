@@ -0,0 +1,97 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import figcache
+
+
+# Background warming of the figure cache (and, through it, the table cache)
+# for the selections users usually open next: the previous and next quarter
+# of the Home page map, and of the same state on the Visualizations page.
+# The dashboard calls it once a page has rendered:
+#
+#     prefetch.home(data_type, year, quarter, periods)
+#
+# Jobs run on a small thread pool. Selections that are cached or already
+# queued are skipped, and prefetched figures nobody has viewed yet take at
+# most PHONEPE_PREFETCH_MB of figcache. They never evict anything a user is
+# looking at.
+# PHONEPE_PREFETCH_WORKERS=0 turns prefetching off.
+
+MAX_PENDING = 16
+
+logger = logging.getLogger("phonepe.prefetch")
+
+
+def neighbours(periods, year, quarter):
+    # The next and previous (Year, Quarter) of a selection among periods.
+    periods = sorted({(int(y), int(q)) for y, q in periods})
+    try:
+        position = periods.index((int(year), int(quarter)))
+    except ValueError:
+        return []
+    return [periods[index] for index in (position + 1, position - 1) if 0 <= index < len(periods)]
+
+
+class Prefetcher:
+    def __init__(self, workers=config.PREFETCH_WORKERS, budget_mb=config.PREFETCH_MB):
+        self.budget = budget_mb * 1024 * 1024
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="prefetch") if workers > 0 else None
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.counters = {"submitted": 0, "skipped": 0, "failed": 0}
+
+    def submit(self, key, function, *args):
+        # Queues function(*args, budget=...) unless the same job is queued
+        # already or too many are waiting. Returns whether it was queued.
+        if self.executor is None:
+            return False
+        with self.lock:
+            if key in self.pending or len(self.pending) >= MAX_PENDING:
+                self.counters["skipped"] += 1
+                return False
+            self.pending.add(key)
+            self.counters["submitted"] += 1
+        self.executor.submit(self._run, key, function, args)
+        return True
+
+    def _run(self, key, function, args):
+        try:
+            function(*args, budget=self.budget)
+        except Exception:
+            with self.lock:
+                self.counters["failed"] += 1
+            logger.exception("Prefetch of %s failed", key)
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+
+    def home(self, data_type, year, quarter, periods):
+        for next_year, next_quarter in neighbours(periods, year, quarter):
+            self.submit(("home", data_type, next_year, next_quarter),
+                        figcache.home, data_type, next_year, next_quarter)
+
+    def state_charts(self, state, year, quarter, periods):
+        for next_year, next_quarter in neighbours(periods, year, quarter):
+            self.submit(("state", str(state), next_year, next_quarter),
+                        figcache.state_charts, state, next_year, next_quarter)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, pending=len(self.pending), budget=self.budget)
+
+
+_prefetcher = Prefetcher()
+
+
+def home(data_type, year, quarter, periods):
+    _prefetcher.home(data_type, year, quarter, periods)
+
+
+def state_charts(state, year, quarter, periods):
+    _prefetcher.state_charts(state, year, quarter, periods)
+
+
+def stats():
+    return _prefetcher.stats()
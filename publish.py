@@ -0,0 +1,90 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import growth
+import ingest
+import ranking
+import rollups
+import schema
+
+
+# Publishing new data without stalling the dashboard. Loads write into shadow
+# tables (Map_User__shadow) while readers keep using the live ones; publish()
+# then swaps every shadow in, creates the indexes and rebuilds the rollups,
+# rankings, growth tables and version stamp in one transaction. PhonePe.db is in WAL mode,
+# so readers are never blocked by that transaction and keep the snapshot
+# they started with; their next query sees the new tables, and the new file
+# stamp invalidates querycache.
+#
+# CSV files and Parquet directories are written next to their target and
+# renamed over it when complete, so a reader gets the old or the new file.
+
+SHADOW_SUFFIX = "__shadow"
+
+
+def shadow(table):
+    return table + SHADOW_SUFFIX
+
+
+def connect(db_path, timeout=60):
+    # A writer connection in autocommit mode with the database in WAL mode.
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=timeout)
+    conn.execute("PRAGMA journal_mode = WAL")
+    return conn
+
+
+def create_shadow(conn, table):
+    # An empty shadow of the table, replacing any left by a failed load.
+    conn.execute(f"DROP TABLE IF EXISTS {shadow(table)}")
+    conn.execute(ingest.create_table_sql(table, shadow(table)))
+    return shadow(table)
+
+
+def drop_shadows(conn, tables):
+    for table in tables:
+        conn.execute(f"DROP TABLE IF EXISTS {shadow(table)}")
+
+
+def swap(conn, tables):
+    # Replaces each table with its shadow and rebuilds everything derived
+    # from them. The caller owns the transaction.
+    for table in tables:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"ALTER TABLE {shadow(table)} RENAME TO {table}")
+    schema.create_indexes(conn, tables)
+    rollups.build_rollups(conn, tables)
+    ranking.build_rankings(conn, tables)
+    growth.build_growth(conn, tables)
+    ingest.bump_version(conn)
+
+
+def publish(conn, tables):
+    # swap() in one transaction of its own: readers see all of the old
+    # tables or all of the new ones.
+    tables = list(tables)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        swap(conn, tables)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def staging_path(path):
+    return f"{path}.{os.getpid()}.tmp"
+
+
+@contextmanager
+def replacing(path):
+    # Yields a temporary path to write; it replaces path when the block
+    # completes and is removed if it fails.
+    temp = staging_path(path)
+    try:
+        yield temp
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    os.replace(temp, path)
@@ -0,0 +1,108 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import config
+import instrument
+
+
+# Process-wide LRU cache of query results for the dashboard. A result is
+# keyed on the normalized SQL text, its parameters, the query backend and
+# the version stamp of the data it reads, so the same query issued by
+# several sections or reruns runs once. For SQLite the stamp comes from
+# os.stat of PhonePe.db and its WAL file: any ingest, incremental update or
+# migration changes it, and checking it never touches SQLite. Old versions
+# are never hit again and age out of the LRU.
+#
+# The cache is bounded by the memory of the frames it holds; the least
+# recently used ones are dropped first. Every caller gets its own copy.
+
+
+def normalize(sql):
+    # Whitespace and a trailing semicolon do not change a query.
+    return re.sub(r"\s+", " ", sql).strip().rstrip(";").strip()
+
+
+def db_stamp(db_path):
+    stamp = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            stamp.append(None)
+        else:
+            stamp.append((info.st_mtime_ns, info.st_size))
+    return tuple(stamp)
+
+
+class QueryCache:
+    def __init__(self, max_bytes=config.QUERY_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[0]
+
+    def put(self, key, frame):
+        size = int(frame.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (frame, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, dropped) = self.entries.popitem(last=False)
+                self.bytes -= dropped
+                self.counters["evictions"] += 1
+
+    def read_sql(self, sql, backend, params=None):
+        # backend.read_sql (a connpool.ConnectionPool or another backend from
+        # backends.py), answered from the cache while the data is unchanged.
+        key = (normalize(sql), tuple(params or ()), backend.name, backend.stamp())
+        with instrument.span("query", key[0], backend=backend.name) as info:
+            frame = self.get(key)
+            info["cached"] = frame is not None
+            if frame is None:
+                frame = backend.read_sql(sql, params)
+                self.put(key, frame)
+            info["rows"] = len(frame)
+            return frame.copy()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, entries=len(self.entries), bytes=self.bytes, max_bytes=self.max_bytes,
+                        hit_rate=self.counters["hits"] / lookups if lookups else 0.0)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+
+_cache = QueryCache()
+
+
+def read_sql(sql, backend, params=None):
+    return _cache.read_sql(sql, backend, params)
+
+
+def stats():
+    return _cache.stats()
+
+
+def clear():
+    _cache.clear()
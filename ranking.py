@@ -0,0 +1,111 @@
+import config
+import querycache
+import schema
+
+
+# Rank_Index: every State, District and Pincode ranked by each metric the
+# dashboard shows as a top or bottom list, per (Year, Quater) and over all
+# periods (Year = Quater = 0). It is built at the end of ingest next to the
+# rollups, and both rank orders are stored, so a top-K or bottom-K list is a
+# range scan of the index instead of a sort of the whole result:
+#
+#     ranking.top(backend, "Map_Transaction", "Transaction_Count", "District", k=10)
+#     ranking.top(backend, "Aggregate_User", "User_Count", "State", 2021, 3, bottom=True)
+#
+# Ties are broken by name, so the order is stable between builds.
+
+TABLE = "Rank_Index"
+
+# (source table, level column, metric column)
+RANKINGS = [
+    ("Aggregate_Transaction", "State", "Transaction_Amount"),
+    ("Aggregate_Transaction", "State", "Transaction_Count"),
+    ("Aggregate_User", "State", "User_Count"),
+    ("Aggregate_Insurance", "State", "Insurance_Amount"),
+    ("Aggregate_Insurance", "State", "Insurance_Count"),
+    ("Map_Transaction", "District", "Transaction_Amount"),
+    ("Map_Transaction", "District", "Transaction_Count"),
+    ("Map_Insurance", "District", "Insurance_Count"),
+    ("Top_Transaction", "Pincode", "Transaction_Amount"),
+    ("Top_Transaction", "Pincode", "Transaction_Count"),
+    ("Top_Insurance", "Pincode", "Insurance_Count"),
+]
+
+def create_table_sql():
+    return (f"CREATE TABLE IF NOT EXISTS {TABLE} (Dataset TEXT, Metric TEXT, Level TEXT, Year INTEGER, "
+            f"Quater INTEGER, Name TEXT, Value NUMERIC, Rank INTEGER, Rank_Asc INTEGER)")
+
+
+def index_sql():
+    keys = "Dataset, Metric, Level, Year, Quater"
+    return [f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_Rank ON {TABLE} ({keys}, Rank, Name, Value)",
+            f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_Rank_Asc ON {TABLE} ({keys}, Rank_Asc, Name, Value)"]
+
+
+def select_sql(source, level, metric):
+    # Totals per period and over all periods, numbered in both directions.
+    return f"""
+        WITH totals AS (
+            SELECT Year, Quater, {level} AS Name, SUM({metric}) AS Value
+            FROM {source} WHERE {level} IS NOT NULL GROUP BY Year, Quater, {level}
+            UNION ALL
+            SELECT 0, 0, {level}, SUM({metric})
+            FROM {source} WHERE {level} IS NOT NULL GROUP BY {level}
+        )
+        SELECT '{source}' AS Dataset, '{metric}' AS Metric, '{level}' AS Level, Year, Quater, Name, Value,
+               ROW_NUMBER() OVER (PARTITION BY Year, Quater ORDER BY Value DESC, Name) AS Rank,
+               ROW_NUMBER() OVER (PARTITION BY Year, Quater ORDER BY Value, Name) AS Rank_Asc
+        FROM totals
+    """
+
+
+def build_rankings(conn, tables=None):
+    # (Re)ranks the given source tables (all by default) on an open
+    # connection; the caller owns the transaction. Returns the source tables
+    # that were ranked.
+    existing = schema.existing_tables(conn)
+    conn.execute(create_table_sql())
+    ranked = []
+    for source, level, metric in RANKINGS:
+        if source not in existing or (tables is not None and source not in tables):
+            continue
+        conn.execute(f"DELETE FROM {TABLE} WHERE Dataset = ? AND Metric = ? AND Level = ?", (source, metric, level))
+        conn.execute(f"INSERT INTO {TABLE} {select_sql(source, level, metric)}")
+        if source not in ranked:
+            ranked.append(source)
+    for sql in index_sql():
+        conn.execute(sql)
+    return ranked
+
+
+def rebuild(db_path=config.DB_PATH, tables=None):
+    # Same as build_rankings in one transaction of its own.
+    return schema.in_transaction(db_path, build_rankings, tables)
+
+
+def ensure(db_path=config.DB_PATH):
+    # Builds Rank_Index for an older PhonePe.db that has none, once per process.
+    schema.once(db_path, TABLE, lambda path: schema.has_table(path, TABLE) or rebuild(path))
+
+
+def top(backend, dataset, metric, level, year=0, quarter=0, k=10, bottom=False, value_name=None):
+    # The k largest (or smallest) entries of a ranking, best first, as a
+    # frame of level and metric columns indexed by rank. Year = Quater = 0
+    # ranks over all periods.
+    rank = "Rank_Asc" if bottom else "Rank"
+    query = f"""
+        SELECT {rank} AS Rank, Name AS {level}, Value AS {value_name or metric}
+        FROM {TABLE}
+        WHERE Dataset = ? AND Metric = ? AND Level = ? AND Year = ? AND Quater = ? AND {rank} <= ?
+        ORDER BY {rank}
+    """
+    frame = querycache.read_sql(query, backend, (dataset, metric, level, int(year), int(quarter), int(k)))
+    return frame.set_index("Rank")
+
+
+def with_columns(ranked, frame, level):
+    # The ranked entries with the other columns of frame (one row per level
+    # value), in rank order. A lookup, not a sort.
+    joined = frame.set_index(level).reindex(ranked[level].astype(str)).reset_index()
+    joined.index = ranked.index
+    return joined
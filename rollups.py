@@ -0,0 +1,102 @@
+import config
+import schema
+
+
+# Small pre-aggregated tables behind every "Analysed Information" tab. They
+# are built once at the end of ingest, so the dashboard reads a few hundred
+# rows instead of running a GROUP BY over the raw tables on every rerun.
+# Aggregates that several tabs share (e.g. transaction amount by State) are
+# built once.
+#
+# name: (source table, GROUP BY columns, [(column, expression), ...])
+ROLLUPS = {
+    # Aggregate_Transaction
+    "Rollup_Txn_State": ("Aggregate_Transaction", ["State"], [
+        ("Total_Transaction_Amount", "SUM(Transaction_Amount)"),
+        ("Total_Transaction_Count", "SUM(Transaction_Count)")]),
+    "Rollup_Txn_State_Year": ("Aggregate_Transaction", ["State", "Year"], [
+        ("Total_Transaction_Amount", "SUM(Transaction_Amount)")]),
+    "Rollup_Txn_State_Quarter": ("Aggregate_Transaction", ["State", "Year", "Quater"], [
+        ("Total_Transaction_Amount", "SUM(Transaction_Amount)")]),
+    "Rollup_Txn_State_Type": ("Aggregate_Transaction", ["State", "Transaction_Name"], [
+        ("Total_Transaction_Amount", "SUM(Transaction_Amount)")]),
+    "Rollup_Txn_State_Type_Quarter": ("Aggregate_Transaction", ["State", "Transaction_Name", "Year", "Quater"], [
+        ("Total_Transaction_Amount", "SUM(Transaction_Amount)")]),
+    "Rollup_Txn_Year_Type": ("Aggregate_Transaction", ["Year", "Transaction_Name"], [
+        ("Total_Transaction_Amount", "SUM(Transaction_Amount)")]),
+    "Rollup_Txn_Type": ("Aggregate_Transaction", ["Transaction_Name"], [
+        ("Total_Transaction_Amount", "SUM(Transaction_Amount)")]),
+    "Rollup_Txn_Quarter": ("Aggregate_Transaction", ["Year", "Quater"], [
+        ("Total_Transaction_Amount", "SUM(Transaction_Amount)")]),
+    # Aggregate_User
+    "Rollup_User_Brand": ("Aggregate_User", ["User_Brand"], [
+        ("Total_Users", "SUM(User_Count)")]),
+    "Rollup_User_State_Brand": ("Aggregate_User", ["State", "User_Brand"], [
+        ("Total_Users", "SUM(User_Count)")]),
+    "Rollup_User_Brand_Year": ("Aggregate_User", ["User_Brand", "Year"], [
+        ("Total_Users", "SUM(User_Count)")]),
+    "Rollup_User_Brand_Quarter": ("Aggregate_User", ["User_Brand", "Year", "Quater"], [
+        ("Total_Users", "SUM(User_Count)")]),
+    # Aggregate_Insurance
+    "Rollup_Ins_State": ("Aggregate_Insurance", ["State"], [
+        ("Total_Insurance_Transactions", "SUM(Insurance_Count)")]),
+    "Rollup_Ins_State_Quarter": ("Aggregate_Insurance", ["State", "Year", "Quater"], [
+        ("Total_Insurance_Transactions", "SUM(Insurance_Count)")]),
+    # Map_User
+    "Rollup_MapUser_State": ("Map_User", ["State"], [
+        ("Total_Registered", "SUM(Registerd_Users)"),
+        ("Total_App_Counts", "SUM(App_Count)")]),
+    "Rollup_MapUser_District": ("Map_User", ["State", "District"], [
+        ("Total_Registered", "SUM(Registerd_Users)"),
+        ("Total_App_Counts", "SUM(App_Count)"),
+        ("Engagement_Rate", "SUM(App_Count)*1.0 / NULLIF(SUM(Registerd_Users), 0)")]),
+    "Rollup_MapUser_State_Quarter": ("Map_User", ["State", "Year", "Quater"], [
+        ("Total_App_Counts", "SUM(App_Count)")]),
+    # Map_Transaction / Map_Insurance
+    "Rollup_MapTxn_District": ("Map_Transaction", ["District"], [
+        ("Total_Amount", "SUM(Transaction_Amount)"),
+        ("Total_Count", "SUM(Transaction_Count)")]),
+    "Rollup_MapIns_District": ("Map_Insurance", ["District"], [
+        ("Total_Insurance_Transactions", "SUM(Insurance_Count)")]),
+    # Top_Transaction / Top_Insurance
+    "Rollup_TopTxn_Pincode": ("Top_Transaction", ["Pincode"], [
+        ("Total_Amount", "SUM(Transaction_Amount)"),
+        ("Total_Count", "SUM(Transaction_Count)")]),
+    "Rollup_TopTxn_State_Pincode": ("Top_Transaction", ["State", "Pincode"], [
+        ("Total_Amount", "SUM(Transaction_Amount)")]),
+    "Rollup_TopIns_Pincode": ("Top_Insurance", ["Pincode"], [
+        ("Total_Insurance_Transactions", "SUM(Insurance_Count)")]),
+}
+
+
+def rollup_sql(name):
+    source, groups, measures = ROLLUPS[name]
+    columns = ", ".join(groups + [f"{expression} AS {alias}" for alias, expression in measures])
+    return f"SELECT {columns} FROM {source} GROUP BY {', '.join(groups)}"
+
+
+def build_rollups(conn, tables=None, only_missing=False):
+    # (Re)builds the rollups of the given source tables (all by default) on
+    # an open connection; the caller owns the transaction. Returns the names
+    # that were built.
+    existing = schema.existing_tables(conn)
+    built = []
+    for name, (source, _, _) in ROLLUPS.items():
+        if source not in existing or (tables is not None and source not in tables):
+            continue
+        if only_missing and name in existing:
+            continue
+        conn.execute(f"DROP TABLE IF EXISTS {name}")
+        conn.execute(f"CREATE TABLE {name} AS {rollup_sql(name)}")
+        built.append(name)
+    return built
+
+
+def rebuild(db_path=config.DB_PATH, tables=None, only_missing=False):
+    # Same as build_rollups in one transaction of its own.
+    return schema.in_transaction(db_path, build_rollups, tables, only_missing)
+
+
+def ensure(db_path=config.DB_PATH):
+    # Builds the rollups an older PhonePe.db is missing, once per process.
+    schema.once(db_path, "rollups", lambda path: rebuild(path, only_missing=True))
@@ -0,0 +1,207 @@
+import sqlite3
+import threading
+
+import config
+import growth
+import ingest
+import publish
+import ranking
+import rollups
+import states
+
+
+# Explicit schema of PhonePe.db: the column types come from
+# ingest.COLUMN_TYPES (integer Year/Quater and counts, real amounts) and the
+# indexes below match the filters and groupings the dashboard and the
+# rollups use. Each index lists the table's measures after the key columns,
+# so sums and counts over those keys (per State and quarter, or per State and
+# District/Pincode) are answered from the index alone without touching the
+# table. An index whose columns changed is rebuilt by create_indexes().
+#
+# Databases written by the old notebook (DataFrame.to_sql) have Year stored
+# as text, no indexes and some state names the map cannot join on;
+# migrate() rewrites them in place.
+
+INDEXES = {
+    "Aggregate_Transaction": [
+        ["State", "Year", "Quater", "Transaction_Amount", "Transaction_Count"],
+        ["Year", "Quater", "State", "Transaction_Amount", "Transaction_Count"],
+        ["Year", "Transaction_Name", "Transaction_Amount"],
+        ["State", "Transaction_Name", "Transaction_Amount"],
+    ],
+    "Aggregate_User": [
+        ["State", "Year", "Quater", "User_Count"],
+        ["Year", "Quater", "State", "User_Count"],
+        ["User_Brand", "Year", "Quater", "User_Count"],
+    ],
+    "Aggregate_Insurance": [
+        ["State", "Year", "Quater", "Insurance_Count", "Insurance_Amount"],
+        ["Year", "Quater", "State", "Insurance_Count", "Insurance_Amount"],
+    ],
+    "Map_Transaction": [
+        ["State", "Year", "Quater", "Transaction_Amount", "Transaction_Count"],
+        ["State", "District", "Transaction_Amount", "Transaction_Count"],
+    ],
+    "Map_User": [
+        ["State", "Year", "Quater", "Registerd_Users", "App_Count"],
+        ["State", "District", "Registerd_Users", "App_Count"],
+    ],
+    "Map_Insurance": [
+        ["State", "Year", "Quater", "Insurance_Count", "Insurance_Amount"],
+        ["State", "District", "Insurance_Count", "Insurance_Amount"],
+    ],
+    "Top_Transaction": [
+        ["State", "Year", "Quater", "Transaction_Amount", "Transaction_Count"],
+        ["State", "Pincode", "Transaction_Amount", "Transaction_Count"],
+    ],
+    "Top_User": [
+        ["State", "Year", "Quater", "Registred_Users"],
+        ["State", "Pincode", "Registred_Users"],
+    ],
+    "Top_Insurance": [
+        ["State", "Year", "Quater", "Insurance_Count", "Insurance_Amount"],
+        ["State", "Pincode", "Insurance_Count", "Insurance_Amount"],
+    ],
+}
+
+_ensured = set()
+_ensure_lock = threading.Lock()
+
+
+def index_name(table, columns):
+    # Named after the key columns, e.g. idx_Map_User_State_Year_Quater.
+    keys = [column for column in columns if ingest.COLUMN_TYPES[column] == "TEXT" or column in ingest.KEY_COLUMNS]
+    return "idx_{}_{}".format(table, "_".join(keys))
+
+
+def index_sql(table):
+    return [f"CREATE INDEX IF NOT EXISTS {index_name(table, columns)} ON {table} ({', '.join(columns)})"
+            for columns in INDEXES[table]]
+
+
+def existing_tables(conn):
+    return {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+
+def has_table(db_path, table):
+    conn = sqlite3.connect(db_path)
+    try:
+        return table in existing_tables(conn)
+    finally:
+        conn.close()
+
+
+def in_transaction(db_path, build, *args):
+    # build(conn, *args) on a connection of its own, in one BEGIN IMMEDIATE
+    # transaction. Returns what build returns.
+    conn = publish.connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = build(conn, *args)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+    finally:
+        conn.close()
+
+
+def once(db_path, name, function):
+    # function(db_path) the first time name is asked for on db_path in this
+    # process; the ensure() of the schema and of every derived table.
+    with _ensure_lock:
+        if (name, db_path) not in _ensured:
+            function(db_path)
+            _ensured.add((name, db_path))
+
+
+def create_indexes(conn, tables=None):
+    # Creating the indexes after the bulk insert is much faster than keeping
+    # them up to date row by row. The caller owns the transaction.
+    existing = existing_tables(conn)
+    for table in tables or ingest.DATASETS:
+        if table in existing:
+            for columns, sql in zip(INDEXES[table], index_sql(table)):
+                name = index_name(table, columns)
+                found = [column for _, _, column in conn.execute(f"PRAGMA index_info({name})")]
+                if found and found != columns:
+                    conn.execute(f"DROP INDEX {name}")
+                conn.execute(sql)
+
+
+def declared_types(conn, table):
+    return {name: kind.upper() for _, name, kind, _, _, _ in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def needs_migration(conn, table):
+    columns = ingest.DATASETS[table].columns
+    return declared_types(conn, table) != {column: ingest.COLUMN_TYPES[column] for column in columns}
+
+
+def _cast(column):
+    kind = ingest.COLUMN_TYPES[column]
+    if kind == "TEXT":
+        # to_sql stored pincodes as REAL when a value was missing (560001.0).
+        return (f"CASE typeof({column}) WHEN 'real' THEN CAST(CAST({column} AS INTEGER) AS TEXT) "
+                f"ELSE CAST({column} AS TEXT) END")
+    return f"CAST({column} AS {kind})"
+
+
+def migrate_table(conn, table):
+    # Copies the table into a typed one and swaps it in. The caller owns the
+    # transaction.
+    columns = ingest.DATASETS[table].columns
+    found = declared_types(conn, table)
+    if set(found) != set(columns):
+        raise ValueError(f"{table} has columns {sorted(found)}, expected {columns}")
+    temp = table + "_typed"
+    conn.execute(f"DROP TABLE IF EXISTS {temp}")
+    conn.execute(ingest.create_table_sql(table, temp))
+    conn.execute(f"INSERT INTO {temp} SELECT {', '.join(_cast(column) for column in columns)} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {temp} RENAME TO {table}")
+
+
+def rename_states(conn, table):
+    # Rewrites state names that are not canonical (see states.py), e.g. the
+    # "Dadra & Nagar Haveli & Daman & Diu" of older ingests. Returns True if
+    # anything changed. The caller owns the transaction.
+    renames = []
+    for (name,) in conn.execute(f"SELECT DISTINCT State FROM {table} WHERE State IS NOT NULL"):
+        canonical = states.canonical_name(name)
+        if canonical != name:
+            renames.append((canonical, name))
+    conn.executemany(f"UPDATE {table} SET State = ? WHERE State = ?", renames)
+    return bool(renames)
+
+
+def _migrate(conn):
+    existing = existing_tables(conn)
+    migrated = [table for table in ingest.DATASETS
+                if table in existing and needs_migration(conn, table)]
+    for table in migrated:
+        migrate_table(conn, table)
+    create_indexes(conn)
+    migrated += [table for table in ingest.DATASETS
+                 if table in existing and rename_states(conn, table) and table not in migrated]
+    if migrated:
+        # The rollups still carry the old Years and names.
+        rollups.build_rollups(conn, migrated)
+        ranking.build_rankings(conn, migrated)
+        growth.build_growth(conn, migrated)
+        ingest.bump_version(conn)
+    return migrated
+
+
+def migrate(db_path=config.DB_PATH):
+    # Brings an existing PhonePe.db to the typed schema and canonical state
+    # names and creates any missing index, all in one transaction. Returns
+    # the migrated tables.
+    return in_transaction(db_path, _migrate)
+
+
+def ensure(db_path=config.DB_PATH):
+    # migrate() once per process.
+    once(db_path, "schema", migrate)
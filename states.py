@@ -0,0 +1,80 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# One canonical name per state: the ST_NM property of the India GeoJSON the
+# Home page map joins on. Source folders are slugs ("andaman-&-nicobar-islands"),
+# and older databases hold names from the old chained str.replace clean-up
+# ("Dadra & Nagar Haveli & Daman & Diu", which never matched the map). Both
+# are looked up through a loose key (lower case, "&" as "and", no dashes), so
+# each spelling maps to the same name. Names are resolved once per distinct
+# value and applied as a categorical remap, never per row.
+
+STATE_NAMES = {
+    "andaman-&-nicobar-islands": "Andaman & Nicobar",
+    "andhra-pradesh": "Andhra Pradesh",
+    "arunachal-pradesh": "Arunachal Pradesh",
+    "assam": "Assam",
+    "bihar": "Bihar",
+    "chandigarh": "Chandigarh",
+    "chhattisgarh": "Chhattisgarh",
+    "dadra-&-nagar-haveli-&-daman-&-diu": "Dadra and Nagar Haveli and Daman and Diu",
+    "delhi": "Delhi",
+    "goa": "Goa",
+    "gujarat": "Gujarat",
+    "haryana": "Haryana",
+    "himachal-pradesh": "Himachal Pradesh",
+    "jammu-&-kashmir": "Jammu & Kashmir",
+    "jharkhand": "Jharkhand",
+    "karnataka": "Karnataka",
+    "kerala": "Kerala",
+    "ladakh": "Ladakh",
+    "lakshadweep": "Lakshadweep",
+    "madhya-pradesh": "Madhya Pradesh",
+    "maharashtra": "Maharashtra",
+    "manipur": "Manipur",
+    "meghalaya": "Meghalaya",
+    "mizoram": "Mizoram",
+    "nagaland": "Nagaland",
+    "odisha": "Odisha",
+    "puducherry": "Puducherry",
+    "punjab": "Punjab",
+    "rajasthan": "Rajasthan",
+    "sikkim": "Sikkim",
+    "tamil-nadu": "Tamil Nadu",
+    "telangana": "Telangana",
+    "tripura": "Tripura",
+    "uttar-pradesh": "Uttar Pradesh",
+    "uttarakhand": "Uttarakhand",
+    "west-bengal": "West Bengal",
+}
+
+
+def _key(name):
+    name = name.lower().replace("&", " and ").replace("-", " ")
+    return re.sub(r"\s+", " ", name).strip()
+
+
+_LOOKUP = {}
+for _slug, _name in STATE_NAMES.items():
+    _LOOKUP[_key(_slug)] = _name
+    _LOOKUP[_key(_name)] = _name
+
+
+def canonical_name(name):
+    # Slug or any earlier spelling -> ST_NM. Unknown names (e.g. synthetic
+    # states) become title case with spaces.
+    return _LOOKUP.get(_key(name), _key(name).title())
+
+
+def canonicalize(values):
+    # Canonical names for a Series of slugs or names, as a categorical.
+    # Spellings of the same state are merged into one category.
+    values = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype("category")
+    names = np.array([canonical_name(str(name)) for name in values.cat.categories], dtype=object)
+    merged, positions = np.unique(names, return_inverse=True)
+    codes = values.cat.codes.to_numpy()
+    codes = np.where(codes < 0, -1, positions[codes] if len(positions) else codes)
+    return pd.Series(pd.Categorical.from_codes(codes, merged), index=values.index, name=values.name)
@@ -0,0 +1,242 @@
+import os
+import time
+import shutil
+import sqlite3
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs
+
+import config
+import ingest
+
+
+# Columnar storage for the nine tables. Each table is a directory of
+# zstd-compressed Parquet files, hive-partitioned by Year and Quater:
+#
+#     <root>/Aggregate_Transaction/v1718000000000000000/Year=2021/Quater=3/part-0.parquet
+#
+# Every rebuild writes a new version next to the table and publishes it by
+# replacing the CURRENT file that names it, so readers switch from one
+# complete version to the next in a single rename. The previous version is
+# kept until the one after, for readers still listing it. Stores written
+# before versions existed have the partitions directly under the table.
+#
+# Reads only touch the columns and partitions they ask for, and files are
+# memory-mapped instead of copied into Python buffers.
+
+_ARROW_TYPES = {"TEXT": pa.string(), "INTEGER": pa.int64(), "REAL": pa.float64()}
+PARTITION_COLUMNS = ["Year", "Quater"]
+PARTITIONING = ds.partitioning(pa.schema([("Year", pa.int16()), ("Quater", pa.int8())]), flavor="hive")
+
+_filesystem = pyarrow.fs.LocalFileSystem(use_mmap=True)
+
+
+def arrow_schema(table):
+    fields = []
+    for name in ingest.DATASETS[table].columns:
+        if name == "Year":
+            fields.append(pa.field(name, pa.int16()))
+        elif name == "Quater":
+            fields.append(pa.field(name, pa.int8()))
+        else:
+            fields.append(pa.field(name, _ARROW_TYPES[ingest.COLUMN_TYPES[name]]))
+    return pa.schema(fields)
+
+
+def record_batch(table, rows):
+    # Row tuples (in the table's column order) -> one Arrow record batch.
+    schema = arrow_schema(table)
+    arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+CURRENT = "CURRENT"
+
+
+def _base_dir(table, root=config.PARQUET_DIR):
+    return os.path.join(root, table)
+
+
+def table_dir(table, root=config.PARQUET_DIR):
+    # The directory of the published version of the table.
+    base = _base_dir(table, root)
+    try:
+        with open(os.path.join(base, CURRENT), "r") as f:
+            return os.path.join(base, f.read().strip())
+    except FileNotFoundError:
+        return base
+
+
+def has_table(table, root=config.PARQUET_DIR):
+    return os.path.isdir(table_dir(table, root))
+
+
+def stage_batches(table, batches, root=config.PARQUET_DIR):
+    # Writes the given record batches (or one Arrow table / DataFrame) to a
+    # staging directory next to the table and returns its path; readers do
+    # not see it until publish_staged(). Batches are consumed lazily, so a
+    # generator keeps memory flat.
+    schema = arrow_schema(table)
+    if hasattr(batches, "columns") and not isinstance(batches, pa.Table):
+        batches = pa.Table.from_pandas(batches, schema=schema, preserve_index=False)
+    if isinstance(batches, pa.Table):
+        batches = batches.cast(schema).to_batches()
+    staging = f"{_base_dir(table, root)}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        ds.write_dataset(
+            batches, staging, schema=schema, format="parquet",
+            partitioning=PARTITIONING, basename_template="part-{i}.parquet",
+            file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+            existing_data_behavior="overwrite_or_ignore",
+        )
+    except BaseException:
+        discard_staged(staging)
+        raise
+    return staging
+
+
+def publish_staged(table, staging, root=config.PARQUET_DIR):
+    # Moves a staged directory into the table as a new version and points
+    # CURRENT at it. Versions older than the previous one are removed.
+    base = _base_dir(table, root)
+    os.makedirs(base, exist_ok=True)
+    previous = table_dir(table, root)
+    version = f"v{time.time_ns()}"
+    os.rename(staging, os.path.join(base, version))
+    pointer = os.path.join(base, CURRENT)
+    temp = f"{pointer}.{os.getpid()}.tmp"
+    with open(temp, "w") as f:
+        f.write(version)
+    os.replace(temp, pointer)
+    keep = {CURRENT, version, os.path.basename(previous)}
+    for name in os.listdir(base):
+        # The partitions of an older unversioned store are the previous version.
+        if name in keep or (previous == base and name.startswith("Year=")):
+            continue
+        path = os.path.join(base, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+
+def discard_staged(staging):
+    shutil.rmtree(staging, ignore_errors=True)
+
+
+def write_batches(table, batches, root=config.PARQUET_DIR):
+    # Replaces the table with the given batches in one step.
+    publish_staged(table, stage_batches(table, batches, root), root)
+
+
+def _link(source, target):
+    # Unchanged files are hard-linked into the new version where the file
+    # system allows it.
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def replace_partitions(table, batches, periods, root=config.PARQUET_DIR):
+    # Publishes a new version of the table in which the given (Year, Quater)
+    # partitions hold the given batches; every other partition is carried
+    # over from the current version unchanged.
+    periods = {(int(year), int(quarter)) for year, quarter in periods}
+    current = table_dir(table, root)
+    staging = stage_batches(table, batches, root)
+    try:
+        for year, quarter in partitions(table, root):
+            if (year, quarter) in periods:
+                continue
+            source = os.path.join(current, f"Year={year}", f"Quater={quarter}")
+            target = os.path.join(staging, f"Year={year}", f"Quater={quarter}")
+            os.makedirs(target)
+            for name in os.listdir(source):
+                _link(os.path.join(source, name), os.path.join(target, name))
+    except BaseException:
+        discard_staged(staging)
+        raise
+    publish_staged(table, staging, root)
+
+
+def dataset(table, root=config.PARQUET_DIR):
+    return ds.dataset(table_dir(table, root), schema=arrow_schema(table), format="parquet",
+                      partitioning=PARTITIONING, filesystem=_filesystem)
+
+
+def _expression(filters):
+    # {"Year": 2021, "Quater": [1, 2], "State": "Goa"} -> Arrow expression.
+    # Filters on Year/Quater prune whole partitions; the rest are pushed
+    # down to the Parquet row-group statistics.
+    expression = None
+    for column, value in (filters or {}).items():
+        if isinstance(value, (list, tuple, set)):
+            term = pc.field(column).isin([getattr(item, "item", lambda: item)() for item in value])
+        else:
+            term = pc.field(column) == getattr(value, "item", lambda: value)()
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def read_arrow(table, columns=None, filters=None, root=config.PARQUET_DIR):
+    return dataset(table, root).to_table(columns=columns, filter=_expression(filters))
+
+
+def read_table(table, columns=None, filters=None, root=config.PARQUET_DIR):
+    return read_arrow(table, columns, filters, root).to_pandas()
+
+
+def partitions(table, root=config.PARQUET_DIR):
+    # [(Year, Quater), ...] from the directory names alone, no file is opened.
+    found = []
+    base = table_dir(table, root)
+    if not os.path.isdir(base):
+        return found
+    for year_dir in os.listdir(base):
+        if not year_dir.startswith("Year="):
+            continue
+        for quarter_dir in os.listdir(os.path.join(base, year_dir)):
+            if quarter_dir.startswith("Quater="):
+                found.append((int(year_dir[len("Year="):]), int(quarter_dir[len("Quater="):])))
+    return sorted(found)
+
+
+def export_periods(conn, table, periods, root=config.PARQUET_DIR, batch_size=50000):
+    # Rewrites the (Year, Quater) partitions of one table from an open
+    # PhonePe.db connection, for incremental refreshes. A table that is not
+    # in the store yet is exported whole.
+    columns = ", ".join(ingest.DATASETS[table].columns)
+    whole = not has_table(table, root)
+    if whole:
+        queries = [(f"SELECT {columns} FROM {table}", ())]
+    else:
+        queries = [(f"SELECT {columns} FROM {table} WHERE Year = ? AND Quater = ?", period)
+                   for period in sorted(periods)]
+    # Read on this thread: Arrow pulls batches from its own threads.
+    batches = []
+    for sql, params in queries:
+        cursor = conn.execute(sql, params)
+        batches += [record_batch(table, rows) for rows in iter(lambda: cursor.fetchmany(batch_size), [])]
+    if whole:
+        write_batches(table, batches, root)
+    else:
+        replace_partitions(table, batches, periods, root)
+
+
+def export_sqlite(db_path=config.DB_PATH, root=config.PARQUET_DIR, datasets=None, batch_size=50000):
+    # Copies tables from PhonePe.db into the Parquet store, one batch at a time.
+    # Arrow pulls the batches on its own threads, hence check_same_thread.
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    try:
+        for table in ingest.select_datasets(datasets):
+            columns = ", ".join(ingest.DATASETS[table].columns)
+            cursor = conn.execute(f"SELECT {columns} FROM {table}")
+            batches = (record_batch(table, rows) for rows in iter(lambda: cursor.fetchmany(batch_size), []))
+            write_batches(table, batches, root)
+    finally:
+        conn.close()
@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import random
+import argparse
+
+import ingest
+
+
+# Writes a synthetic pulse-master/data tree with the same layout and JSON
+# shapes as the real PhonePe Pulse checkout, at any scale, for benchmarks
+# and for trying the pipeline without the real data:
+#
+#     python synthetic.py /tmp/pulse --states 36 --years 7 --districts 40 --pincodes 10
+#
+# The output only depends on the arguments and the seed.
+
+STATE_SLUGS = [
+    "andaman-&-nicobar-islands", "andhra-pradesh", "arunachal-pradesh", "assam", "bihar", "chandigarh",
+    "chhattisgarh", "dadra-&-nagar-haveli-&-daman-&-diu", "delhi", "goa", "gujarat", "haryana",
+    "himachal-pradesh", "jammu-&-kashmir", "jharkhand", "karnataka", "kerala", "ladakh", "lakshadweep",
+    "madhya-pradesh", "maharashtra", "manipur", "meghalaya", "mizoram", "nagaland", "odisha", "puducherry",
+    "punjab", "rajasthan", "sikkim", "tamil-nadu", "telangana", "tripura", "uttar-pradesh", "uttarakhand",
+    "west-bengal",
+]
+TRANSACTION_TYPES = ["Recharge & bill payments", "Peer-to-peer payments", "Merchant payments",
+                     "Financial Services", "Others"]
+BRANDS = ["Xiaomi", "Samsung", "Vivo", "Oppo", "OnePlus", "Realme", "Apple", "Motorola", "Lenovo", "Huawei",
+          "Others"]
+
+
+def state_slugs(count):
+    # The real 36 slugs first, then made-up ones for larger scales.
+    return STATE_SLUGS[:count] + [f"state-{i}" for i in range(len(STATE_SLUGS) + 1, count + 1)]
+
+
+def _write(root, dataset, state, year, quarter, data):
+    folder = os.path.join(root, ingest.DATASETS[dataset].path, state, str(year))
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, f"{quarter}.json"), "w") as f:
+        json.dump({"success": True, "code": "SUCCESS", "data": data, "responseTimestamp": 0}, f)
+
+
+def _metric(rng, count, amount):
+    return {"type": "TOTAL", "count": rng.randint(1, count), "amount": rng.random() * amount}
+
+
+def _quarter(rng, state, districts, pincodes, brands):
+    # {table: "data" part of that table's quarter file}
+    names = [f"{state.replace('-', ' ')} district {i}" for i in range(1, districts + 1)]
+    pins = [str(rng.randint(110001, 855999)) for _ in range(pincodes)]
+    return {
+        "Aggregate_Transaction": {"transactionData": [
+            {"name": name, "paymentInstruments": [_metric(rng, 10 ** 8, 1e11)]} for name in TRANSACTION_TYPES]},
+        "Aggregate_Insurance": {"transactionData": [
+            {"name": "Insurance", "paymentInstruments": [_metric(rng, 10 ** 5, 1e9)]}]},
+        "Aggregate_User": {"aggregated": {"registeredUsers": rng.randint(1, 10 ** 7), "appOpens": 0},
+                           "usersByDevice": [{"brand": brand, "count": rng.randint(1, 10 ** 6),
+                                              "percentage": rng.random()} for brand in BRANDS[:brands]]},
+        "Map_Transaction": {"hoverDataList": [
+            {"name": name, "metric": [_metric(rng, 10 ** 7, 1e10)]} for name in names]},
+        "Map_Insurance": {"hoverDataList": [
+            {"name": name, "metric": [_metric(rng, 10 ** 4, 1e8)]} for name in names]},
+        "Map_User": {"hoverData": {
+            name: {"registeredUsers": rng.randint(1, 10 ** 6), "appOpens": rng.randint(0, 10 ** 7)}
+            for name in names}},
+        "Top_Transaction": {"states": None, "districts": [], "pincodes": [
+            {"entityName": pin, "metric": _metric(rng, 10 ** 6, 1e9)} for pin in pins]},
+        "Top_Insurance": {"states": None, "districts": [], "pincodes": [
+            {"entityName": pin, "metric": _metric(rng, 10 ** 3, 1e7)} for pin in pins]},
+        "Top_User": {"states": None, "districts": [], "pincodes": [
+            {"name": pin, "registeredUsers": rng.randint(1, 10 ** 5)} for pin in pins]},
+    }
+
+
+def generate(root, states=36, years=7, quarters=4, districts=20, pincodes=10, brands=10,
+             first_year=2018, seed=0, datasets=None):
+    # Returns the number of files written.
+    rng = random.Random(seed)
+    tables = ingest.select_datasets(datasets)
+    written = 0
+    for state in state_slugs(states):
+        for year in range(first_year, first_year + years):
+            for quarter in range(1, quarters + 1):
+                for table, data in _quarter(rng, state, districts, pincodes, brands).items():
+                    if table in tables:
+                        _write(root, table, state, year, quarter, data)
+                        written += 1
+    return written
+
+
+def add_arguments(parser):
+    parser.add_argument("--states", type=int, default=36)
+    parser.add_argument("--years", type=int, default=7)
+    parser.add_argument("--quarters", type=int, default=4, choices=range(1, 5))
+    parser.add_argument("--districts", type=int, default=20, help="districts per state")
+    parser.add_argument("--pincodes", type=int, default=10, help="top pincodes per state and quarter")
+    parser.add_argument("--brands", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic pulse-master/data tree.")
+    parser.add_argument("root")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    written = generate(args.root, args.states, args.years, args.quarters, args.districts, args.pincodes,
+                       args.brands, seed=args.seed)
+    print(f"{written:,} files written under {args.root}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
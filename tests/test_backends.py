@@ -0,0 +1,66 @@
+import glob
+import json
+import os
+
+import pytest
+
+pytest.importorskip("duckdb")
+pytest.importorskip("pyarrow")
+
+import backends
+import connpool
+import ingest
+import pipeline
+import synthetic
+
+
+# Runs every dashboard query, ranking lookup and growth table on SQLite and
+# on DuckDB over the Parquet store written by the same ingest, and expects
+# the same results. The synthetic tree has a district without registered
+# users (a zero denominator) and an empty Aggregate_Insurance folder (a
+# table without rows).
+
+
+def _zero_users(root, state, district):
+    pattern = os.path.join(root, ingest.DATASETS["Map_User"].path, state, "*", "*.json")
+    for path in glob.glob(pattern):
+        with open(path) as f:
+            document = json.load(f)
+        document["data"]["hoverData"][district]["registeredUsers"] = 0
+        with open(path, "w") as f:
+            json.dump(document, f)
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    base = tmp_path_factory.mktemp("backends")
+    root = str(base / "data")
+    tables = [table for table in ingest.DATASETS if table != "Aggregate_Insurance"]
+    synthetic.generate(root, states=3, years=2, districts=3, pincodes=4, brands=3, datasets=tables)
+    os.makedirs(os.path.join(root, ingest.DATASETS["Aggregate_Insurance"].path))
+    state = synthetic.state_slugs(1)[0]
+    _zero_users(root, state, f"{state.replace('-', ' ')} district 1")
+    db_path, parquet_dir = str(base / "PhonePe.db"), str(base / "parquet")
+    counts = pipeline.run_pipeline(root, db_path, parquet_dir=parquet_dir, workers=1)
+    assert counts["Aggregate_Insurance"] == 0
+    return db_path, parquet_dir
+
+
+def test_backends_agree(store):
+    db_path, parquet_dir = store
+    sqlite = connpool.ConnectionPool(db_path)
+    duckdb = backends.DuckDBBackend(parquet_dir)
+    assert backends.compare(sqlite, duckdb) == []
+
+
+def test_zero_denominator_is_null(store):
+    db_path, parquet_dir = store
+    sql = "SELECT Engagement_Rate FROM Rollup_MapUser_District WHERE Engagement_Rate IS NULL"
+    assert len(connpool.ConnectionPool(db_path).read_sql(sql)) == 1
+    assert len(backends.DuckDBBackend(parquet_dir).read_sql(sql)) == 1
+
+
+def test_empty_table(store):
+    _, parquet_dir = store
+    frame = backends.DuckDBBackend(parquet_dir).read_sql("SELECT * FROM Aggregate_Insurance")
+    assert frame.empty and list(frame.columns) == ingest.DATASETS["Aggregate_Insurance"].columns